@@ -0,0 +1,189 @@
+'''
+Archive.
+
+This program lints the python files inside zip and tar archives,
+such as wheels, eggs and sdists, without extracting them to disk.
+Every .py member is read straight out of the archive into memory,
+linted with guarded_instances from guard.py, and its output files
+are written to a separate output directory instead of next to the
+python file, since there is no python file on disk to write them
+next to.
+
+The output files of a member go under the output directory, in a
+directory named after the archive, at the path of the member inside
+the archive. The directory name ends with a short hash of the full
+path of the archive, so that archives with the same name in
+different directories do not write over each other. The path is
+cleaned first, so that a member named with '..', an absolute path
+or characters that are not allowed in file names cannot write
+outside the output directory. For example the member pkg/util.py of
+dist/pkg-1.0.tar.gz gets:
+
+    <output directory>/pkg-1.0.tar.gz-1c2d3e4f/pkg/util.lint.csv
+    <output directory>/pkg-1.0.tar.gz-1c2d3e4f/pkg/util.lines.idx
+    <output directory>/pkg-1.0.tar.gz-1c2d3e4f/pkg/util.score.csv
+
+Every member is known by the name of its archive and its path inside
+the archive joined by '!', such as dist/pkg-1.0.tar.gz!pkg/util.py.
+'''
+import hashlib
+import os
+import re
+import tarfile
+import zipfile
+from guard import MAX_FILE_BYTES, guarded_instances
+from lint import calculate_total_penalty, calculate_quality_score, \
+    write_lint_csv, write_line_index, append_quality_score
+from sinks import write_instances
+from utils import split_source
+
+# Characters that are not allowed in file names on some systems.
+UNSAFE_CHARACTERS = re.compile(r'[\x00-\x1f<>:"|?*]')
+
+
+def generate_members(archive_filename, max_bytes=MAX_FILE_BYTES):
+    '''
+    Generates the name and contents of every .py file in a zip or tar
+    archive, reading each into memory in turn. Tar archives are read
+    as a stream from start to end, so compressed tar archives are only
+    decompressed once.
+
+    Parameters:
+
+        archive_filename: The name of the archive. Wheels and eggs are
+                          zip archives, and sdists are usually
+                          compressed tar archives.
+        max_bytes: The largest member to read. Larger members are
+                   generated with None as their contents.
+
+    Result: A generator of (member name, contents) tuples, with the
+    contents as bytes. Raises ValueError if the file is not a zip or
+    tar archive.
+
+    Example:
+    archive_filename = 'dist/pkg-1.0-py3-none-any.whl'
+
+    >>>next(generate_members(archive_filename))
+    ('pkg/__init__.py', b'"""A package."""\\n')
+    '''
+    if zipfile.is_zipfile(archive_filename):
+        with zipfile.ZipFile(archive_filename) as archive:
+            for member in archive.infolist():
+                if member.is_dir() or not member.filename.endswith('.py'):
+                    continue
+                if member.file_size > max_bytes:
+                    yield member.filename, None
+                else:
+                    yield member.filename, archive.read(member)
+    elif tarfile.is_tarfile(archive_filename):
+        with tarfile.open(archive_filename, 'r|*') as archive:
+            for member in archive:
+                if not member.isfile() or not member.name.endswith('.py'):
+                    continue
+                if member.size > max_bytes:
+                    yield member.name, None
+                else:
+                    yield member.name, archive.extractfile(member).read()
+    else:
+        raise ValueError('%s is not a zip or tar archive' % archive_filename)
+
+
+def output_filename(out_directory, archive_filename, member_name):
+    '''
+    Returns the name to give a member of an archive in the output
+    directory, made from the name of the archive and the path of the
+    member with every empty, '.' and '..' part left out and every
+    character that cannot be in a file name replaced by '_'.
+
+    The name of the archive is followed by the first 8 hex digits of
+    the sha1 hash of its absolute path, so that dist/pkg-1.0.tar.gz
+    and old/dist/pkg-1.0.tar.gz get different directories.
+
+    Example:
+    out_directory = 'out'
+    archive_filename = 'dist/pkg-1.0.tar.gz'
+    member_name = 'pkg-1.0/../../etc/a:b.py'
+
+    >>>'out/pkg-1.0.tar.gz-1c2d3e4f/pkg-1.0/etc/a_b.py'
+    '''
+    path_hash = hashlib.sha1(os.path.abspath(archive_filename).encode(
+        'utf-8', 'surrogateescape')).hexdigest()[:8]
+    parts = ['%s-%s' % (os.path.basename(archive_filename), path_hash)] + \
+        member_name.replace('\\', '/').split('/')
+    safe_parts = [UNSAFE_CHARACTERS.sub('_', part) for part in parts
+                  if part not in ('', '.', '..')]
+    return os.path.join(out_directory, *safe_parts)
+
+
+def lint_archive(archive_filename, out_directory, formats=None,
+                 compress=False, max_bytes=MAX_FILE_BYTES):
+    '''
+    Lints every .py file in a zip or tar archive, and writes the same
+    output files for each as lint from lint.py does, in the output
+    directory, as described at the top of this program.
+
+    A member that is too large or whose encoding cannot be read is
+    not linted, and the other members are linted as usual. A member
+    that cannot be tokenized is linted with guarded_instances from
+    guard.py, so it still gets the long line and trailing whitespace
+    checks, and the tokenize error is listed with the errors.
+
+    Parameters:
+
+        archive_filename: The name of the archive.
+        out_directory: The directory to write the output files to.
+        formats: The names of the formats to write the instances in as
+                 well as the csv file, from SINKS in sinks.py, or None
+                 for just the csv file.
+        compress: Whether to compress the instances with gzip, when
+                  formats are given.
+        max_bytes: The largest member to lint.
+
+    Result: A 2-tuple of a list of [name, lines, penalty, quality score]
+    lists, one for every member linted, and a list of [name, error]
+    lists, one for every member that could not be linted or could
+    only be linted in part, where each name is the archive name and
+    the member name joined by '!'.
+
+    Example:
+    archive_filename = 'dist/pkg-1.0.tar.gz'
+    out_directory = 'out'
+
+    >>>([['dist/pkg-1.0.tar.gz!pkg-1.0/pkg/__init__.py', 12, 0, '10.00'],
+         ['dist/pkg-1.0.tar.gz!pkg-1.0/pkg/util.py', 240, 31, '8.71']],
+        [])
+    '''
+    scores = []
+    errors = []
+    for (member_name, source) in generate_members(archive_filename,
+                                                  max_bytes):
+        name = archive_filename + '!' + member_name
+        if source is None:
+            errors.append([name, 'the member is more than %d bytes' %
+                           max_bytes])
+            continue
+        try:
+            encoding, lines = split_source(source)
+        except (SyntaxError, UnicodeDecodeError) as error:
+            errors.append([name, str(error)])
+            continue
+        list_total, problems = guarded_instances(name, source, encoding,
+                                                 lines)
+        for (error_type, line_number, description) in problems:
+            errors.append([name, description])
+
+        out_filename = output_filename(out_directory, archive_filename,
+                                       member_name)
+        if not os.path.isdir(os.path.dirname(out_filename)):
+            os.makedirs(os.path.dirname(out_filename))
+        if formats is None:
+            write_lint_csv(out_filename, list_total)
+        else:
+            write_instances(out_filename[:-2], name, list_total, formats,
+                            compress)
+        write_line_index(out_filename, source, encoding)
+        total_penalty = calculate_total_penalty(list_total)
+        quality_score = calculate_quality_score(total_penalty, len(lines))
+        append_quality_score(out_filename, quality_score)
+        scores.append([name, len(lines), total_penalty, quality_score])
+    return scores, errors
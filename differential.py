@@ -0,0 +1,689 @@
+'''
+Differential.
+
+This program checks that the faster ways of linting a file in this
+project give exactly the same results as the original lint. It
+generates random python programs, lints each of them with the
+original lint and with every other engine, and compares the
+.lint.csv files byte for byte and the quality scores written to
+the .score.csv files.
+
+The original lint is kept here as a frozen copy, the reference
+functions below, so that changing lint.py can never change what
+the engines are compared against. It reads the program as text and
+tokenizes it with vars_indents as it was first written.
+
+The programs are made of random statements, blocks, comments,
+strings, long lines, unicode names and trailing whitespace, with
+indents of spaces or tabs, newline or carriage return line endings,
+and sometimes no newline at the end. Some of them are then fuzzed
+by inserting, deleting and repeating random characters and lines.
+A program that the reference cannot lint, because it does not
+tokenize, is skipped. Every program is UTF-8, and the same seed
+always gives the same programs.
+
+Run it from the command line, for example:
+
+    python differential.py --cases 1000 --seed 1 --keep failures
+
+which prints how many programs every engine was compared on and how
+many of them differed, and keeps every program that differed in the
+failures directory. The exit code is 1 if any engine differed.
+
+With --prescan it instead checks that token_checks_possible from
+utils.py never rules out a single character variable or a bad
+indent that the tokenizer finds, on random programs, half of which
+have no single character or non-ASCII names so that the variables
+are often ruled out, and on every .py file under the directories
+given with --walk:
+
+    python differential.py --prescan --cases 2000 --walk /usr/lib/python3
+'''
+import argparse
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from keyword import iskeyword
+from token import NAME, INDENT
+from tokenize import generate_tokens, TokenError
+import lint
+from guard import guarded_lint
+from pipeline import lint_many
+from utils import get_current_date_time, read_source, token_tables, \
+    split_source, vars_indents, token_checks_possible
+from viewport import lint_viewport
+
+# Names used in the random programs, with and without a single
+# character.
+SHORT_NAMES = ['x', 'i', 'n', '_', 'é', 'λ', 'Ω']
+LONG_NAMES = ['value', 'total', 'ñame', 'count_2', 'größe', '变量', 'item']
+
+# The names of the programs that token_checks_possible can rule the
+# single character variables out of.
+ASCII_LONG_NAMES = [name for name in LONG_NAMES if name.isascii()]
+
+# The text of comments and strings in the random programs.
+WORDS = ['lint', 'tab\there', 'café', '€uro', '日本語', 'quote"s', "it's",
+         'x', 'emoji 😀', 'back\\slash', '   spaced   ']
+
+# The characters inserted by fuzzing.
+FUZZ_CHARACTERS = ' \t\r\n\x0c#"\'\\():xé€😀\u2028\x85'
+
+
+def reference_vars_indents(python_filename):
+    '''
+    The vars_indents function of utils.py as it was first written.
+    '''
+    python_file = open(python_filename, encoding='utf-8')
+    token_gen = generate_tokens(python_file.readline)
+    variables = {}
+    indents = {}
+    for (token_type, token_text, start_pos, end_pos, _src_line) in token_gen:
+        if token_type == NAME and not iskeyword(token_text):
+            line_number, start_col = start_pos
+            token_info = (token_text, start_col + 1)
+            if line_number in variables:
+                variables[line_number].append(token_info)
+            else:
+                variables[line_number] = [token_info]
+        elif token_type == INDENT:
+            line_number, end_col = end_pos
+            token_info = (token_text, end_col + 1)
+            indents[line_number] = token_info
+    python_file.close()
+    return variables, indents
+
+
+def reference_find_single_char_variable(python_filename, lines):
+    '''
+    The find_single_char_variable function of lint.py as it was
+    first written.
+    '''
+    variable_dictionary = reference_vars_indents(python_filename)
+    single_char_var_list = []
+
+    for each_key in variable_dictionary[0].keys():
+        for each_variable in variable_dictionary[0][each_key]:
+            if len(each_variable[0]) == 1:
+                single_char_var_list.append(["SINGLE_CHAR_VAR",
+                                            int(each_key), each_variable[1],
+                                            each_variable[0],
+                                            lines[each_key-1][:-1]])
+    return single_char_var_list
+
+
+def reference_find_long_line(python_filename, lines):
+    '''
+    The find_long_line function of lint.py as it was first written.
+    '''
+    long_line_list = []
+    line_count = 0
+
+    for each_line in lines:
+        line_length = sum(1 for char in each_line)
+        line_count += 1
+        if line_length >= 80:
+            long_line_list.append(["LONG_LINE", int(line_count), "",
+                                  (line_length - 1), each_line[:-1]])
+    return long_line_list
+
+
+def reference_find_trail_whitespace(python_filename, lines):
+    '''
+    The find_trail_whitespace function of lint.py as it was first
+    written.
+    '''
+    trail_whitespace_list = []
+    line_count = 0
+
+    for each_line in lines:
+        line_count += 1
+        column_num = len(each_line.rstrip()) + 1
+        if ' \n' in each_line or '\t\n' in each_line:
+            trail_whitespace_list.append(["TRAIL_WHITESPACE", int(line_count),
+                                         column_num, '', each_line[:-1]])
+
+    return trail_whitespace_list
+
+
+def reference_find_bad_indent(python_filename, lines):
+    '''
+    The find_bad_indent function of lint.py as it was first written.
+    '''
+    variable_dictionary = reference_vars_indents(python_filename)
+    bad_indent_list = []
+
+    for each_key in variable_dictionary[1].keys():
+        for indent in variable_dictionary[1][each_key]:
+            if (str(indent).count(' ') % 4) > 0 or '\t' in str(indent):
+                bad_indent_list.append(["BAD_INDENT", int(each_key),
+                                       variable_dictionary[1][each_key][1],
+                                       '', lines[each_key-1][:-1]])
+    return bad_indent_list
+
+
+def reference_write_quality_score_log(python_filename, list_total, lines):
+    '''
+    The write_quality_score_log function of lint.py as it was first
+    written.
+    '''
+    quality_filename = python_filename[:-2] + 'score.csv'
+    quality_file = open(quality_filename, 'a')
+    writer = csv.writer(quality_file)
+
+    weights = {"TRAIL_WHITESPACE": 1, "SINGLE_CHAR_VAR": 2,
+               "BAD_INDENT": 4, "LONG_LINE": 5}
+    total_penalty = sum(weights[each_item[0]] for each_item in list_total)
+    num_lines = sum(1 for each_line in lines)
+
+    if total_penalty == 0:
+        score = 0
+    else:
+        score = float(total_penalty) / float(num_lines)
+
+    quality_score = "%.2f" % (max(0, 10 - score * 10))
+    writer.writerow([get_current_date_time(), quality_score])
+    quality_file.close()
+
+
+def reference_lint(python_filename):
+    '''
+    The lint function of lint.py as it was first written.
+    '''
+    in_file = open(python_filename, encoding='utf-8')
+    lines = in_file.readlines()
+    in_file.close()
+    out_filename = python_filename[:-2] + 'lint.csv'
+    out_file = open(out_filename, 'w')
+    writer = csv.writer(out_file)
+
+    list_total = []
+    list_total += reference_find_single_char_variable(python_filename, lines)
+    list_total += reference_find_long_line(python_filename, lines)
+    list_total += reference_find_trail_whitespace(python_filename, lines)
+    list_total += reference_find_bad_indent(python_filename, lines)
+    list_total.sort(key=lambda tup: tup[1])
+
+    writer.writerow(["ERROR_TYPE", "LINE_NUMBER",
+                    "COLUMN", "INFO", "SOURCE_LINE"])
+    for each_item in list_total:
+        writer.writerow(each_item)
+    out_file.close()
+
+    reference_write_quality_score_log(python_filename, list_total, lines)
+
+
+def text_lint(python_filename):
+    '''
+    Lints a file with the rules of lint.py given the lines as text,
+    the way the rules were first called.
+    '''
+    in_file = open(python_filename, encoding='utf-8')
+    lines = in_file.readlines()
+    in_file.close()
+    list_total = lint.find_single_char_variable(python_filename, lines) + \
+        lint.find_long_line(python_filename, lines) + \
+        lint.find_trail_whitespace(python_filename, lines) + \
+        lint.find_bad_indent(python_filename, lines)
+    list_total.sort(key=lambda tup: tup[1])
+    lint.write_lint_csv(python_filename, list_total)
+    lint.write_quality_score_log(python_filename, list_total, lines)
+
+
+def tables_lint(python_filename):
+    '''
+    Lints a file with the rules of lint.py given the lines as text,
+    searching the token tables from token_tables in utils.py instead
+    of tokenizing the file in each rule.
+    '''
+    in_file = open(python_filename, encoding='utf-8')
+    lines = in_file.readlines()
+    in_file.close()
+    tables = token_tables(python_filename, lines)
+    list_total = lint.find_single_char_variable(python_filename, lines,
+                                                tables=tables) + \
+        lint.find_long_line(python_filename, lines) + \
+        lint.find_trail_whitespace(python_filename, lines) + \
+        lint.find_bad_indent(python_filename, lines, tables=tables)
+    list_total.sort(key=lambda tup: tup[1])
+    lint.write_lint_csv(python_filename, list_total)
+    lint.write_quality_score_log(python_filename, list_total, lines)
+
+
+def gate_lint(python_filename):
+    '''
+    Lints a file with gate from lint.py, which finds the instances
+    with generate_instances, writing every instance.
+    '''
+    lint.gate(python_filename, write_csv=True)
+
+
+def guard_lint(python_filename):
+    '''
+    Lints a file with guarded_lint from guard.py, with no time limit.
+    '''
+    errors = guarded_lint(python_filename, max_seconds=None)
+    if errors:
+        raise ValueError(errors[0][3])
+
+
+def pipeline_lint(python_filename):
+    '''
+    Lints a file with lint_many from pipeline.py, checking it in a
+    thread.
+    '''
+    with ThreadPoolExecutor(1) as cpu_executor:
+        failures = lint_many([python_filename], 1, cpu_executor)
+    if failures:
+        raise failures[python_filename]
+
+
+def sinks_lint(python_filename):
+    '''
+    Lints a file with lint from lint.py, writing the csv file with
+    the csv sink from sinks.py.
+    '''
+    lint.lint(python_filename, ["csv"])
+
+
+def viewport_lint(python_filename):
+    '''
+    Lints a file with lint_viewport from viewport.py, in chunks of a
+    few lines, starting from the middle of the file.
+    '''
+    lines = read_source(python_filename)[2]
+    middle = len(lines) // 2 + 1
+    result = lint_viewport(python_filename, middle, middle, float('inf'), 3)
+    lint.write_lint_csv(python_filename, result["INSTANCES"])
+    lint.write_quality_score_log(python_filename, result["INSTANCES"], lines)
+
+
+# The engines compared with the reference, by name. Each lints one
+# file, writing its .lint.csv file and a row of its .score.csv file.
+ENGINES = {"lint": lint.lint,
+           "text": text_lint,
+           "tables": tables_lint,
+           "gate": gate_lint,
+           "guard": guard_lint,
+           "pipeline": pipeline_lint,
+           "sinks": sinks_lint,
+           "viewport": viewport_lint}
+
+
+def random_text(rng):
+    '''
+    Returns a few random words for a comment or a string.
+    '''
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+
+
+def random_statement(rng, names=None):
+    '''
+    Returns a random simple statement, which can be long and can
+    span several lines, using the given names, or all the names by
+    default.
+    '''
+    if names is None:
+        names = SHORT_NAMES + LONG_NAMES
+    name = rng.choice(names)
+    other = rng.choice(names)
+    kind = rng.randint(0, 7)
+    if kind == 0:
+        return '%s = %s + %d' % (name, other, rng.randint(0, 99))
+    if kind == 1:
+        return '%s = %r' % (name, random_text(rng))
+    if kind == 2:
+        return '%s = f"{%s} %s"' % (name, other,
+                                    random_text(rng).replace('\\', '/'))
+    if kind == 3:
+        # A long line, of ASCII or unicode names.
+        return '%s = [%s]' % (name, ', '.join(
+            rng.choice(names) for _ in range(rng.randint(10, 40))))
+    if kind == 4:
+        return '%s = (%s +\n%s%s)' % (name, other,
+                                      ' ' * rng.randint(0, 9), other)
+    if kind == 5:
+        return '%s = """%s  \n%s\t\n"""' % (name, random_text(rng),
+                                            random_text(rng))
+    if kind == 6:
+        return '%s = %s \\\n    + 1' % (name, other)
+    return 'print(%s, %s)  # %s' % (name, other, random_text(rng))
+
+
+def random_source(rng, names=None):
+    '''
+    Returns the text of a random python program, using the given
+    names, or all the names by default.
+
+    The program is a list of statements, comments and blank lines,
+    some of which start an indented block. Every block is indented
+    by one more unit than the block around it, where the unit is
+    chosen at random for the whole program, so the indents are
+    consistent but not always 4 spaces.
+    '''
+    if names is None:
+        names = SHORT_NAMES + LONG_NAMES
+    unit = rng.choice(['    ', '    ', '  ', '   ', '\t', '        ', ' '])
+    depth = 0
+    lines = []
+    for _ in range(rng.randint(1, 40)):
+        indent = unit * depth
+        kind = rng.random()
+        if kind < 0.1:
+            line = rng.choice(['', ' ', '\t', '   '])
+        elif kind < 0.2:
+            line = indent + '# ' + random_text(rng)
+        elif kind < 0.4 and depth < 4:
+            header = rng.choice(['def %s(%s, %s):', 'for %s in %s(%s):',
+                                 'if %s and %s(%s):', 'class %s(%s, %s):'])
+            line = indent + header % tuple(rng.choice(names)
+                                           for _ in range(3))
+            line += '\n' + indent + unit + random_statement(rng, names)
+            depth += 1
+        else:
+            line = indent + random_statement(rng, names)
+            if depth and rng.random() < 0.3:
+                depth = rng.randint(0, depth - 1)
+        if rng.random() < 0.15:
+            line += rng.choice([' ', '\t', '  ', ' \t'])
+        lines.append(line)
+
+    ending = rng.choice(['\n', '\n', '\r\n', 'mixed'])
+    source = ''
+    for line in lines:
+        for part in line.split('\n'):
+            if ending == 'mixed':
+                source += part + rng.choice(['\n', '\r\n', '\r'])
+            else:
+                source += part + ending
+    if rng.random() < 0.3:
+        source = source.rstrip('\r\n')
+    return source
+
+
+def fuzz_source(source, rng):
+    '''
+    Returns a random program with a few random characters inserted
+    and deleted, and a few of its lines repeated.
+    '''
+    for _ in range(rng.randint(1, 6)):
+        position = rng.randint(0, len(source))
+        kind = rng.randint(0, 2)
+        if kind == 0:
+            source = source[:position] + rng.choice(FUZZ_CHARACTERS) + \
+                source[position:]
+        elif kind == 1:
+            source = source[:position] + source[position + 1:]
+        else:
+            lines = source.splitlines(True)
+            if lines:
+                index = rng.randrange(len(lines))
+                lines.insert(index, lines[index])
+            source = ''.join(lines)
+    return source
+
+
+def lint_copy(engine, source_bytes, directory, name):
+    '''
+    Writes a program to its own file in a directory, lints it with
+    an engine, and returns the contents of its .lint.csv file and its
+    quality score, or the error the engine raised.
+    '''
+    python_filename = os.path.join(directory, name + '.py')
+    with open(python_filename, 'wb') as python_file:
+        python_file.write(source_bytes)
+    try:
+        engine(python_filename)
+    except Exception as error:
+        return ('error', '%s: %s' % (type(error).__name__, error))
+    with open(python_filename[:-2] + 'lint.csv', 'rb') as contents:
+        lint_csv = contents.read()
+    with open(python_filename[:-2] + 'score.csv') as contents:
+        quality_score = list(csv.reader(contents))[-1][1]
+    return (lint_csv, quality_score)
+
+
+def compare_engines(num_cases=200, seed=0, engines=None, fuzz_fraction=0.3,
+                    keep_directory=None):
+    '''
+    Lints num_cases random programs with the reference and with each
+    engine, and finds every program where an engine gave a different
+    .lint.csv file or quality score, or raised an error.
+
+    Parameters:
+
+        num_cases: The number of random programs to make.
+        seed: The seed of the random programs.
+        engines: The names of the engines to compare, from ENGINES,
+                 or None for all of them.
+        fuzz_fraction: The fraction of programs that are fuzzed.
+        keep_directory: A directory to copy every program that an
+                        engine differed on to, or None.
+
+    Result: A 2-tuple of a dictionary from the name of every engine to
+    the number of programs it was compared on, and a list of
+    (case number, engine, description) tuples, one for each difference.
+
+    Example:
+    num_cases = 500
+    seed = 1
+
+    >>>({'gate': 431, 'guard': 431, 'lint': 431, 'pipeline': 431,
+         'sinks': 431, 'text': 431}, [])
+    '''
+    if engines is None:
+        engines = sorted(ENGINES)
+    rng = random.Random(seed)
+    compared = dict.fromkeys(engines, 0)
+    differences = []
+    directory = tempfile.mkdtemp()
+    try:
+        for case in range(num_cases):
+            source = random_source(rng)
+            if rng.random() < fuzz_fraction:
+                source = fuzz_source(source, rng)
+            source_bytes = source.encode('utf-8')
+            expected = lint_copy(reference_lint, source_bytes, directory,
+                                 'reference%d' % case)
+            if expected[0] == 'error':
+                continue
+            for name in engines:
+                compared[name] += 1
+                found = lint_copy(ENGINES[name], source_bytes, directory,
+                                  '%s%d' % (name, case))
+                if found == expected:
+                    continue
+                if found[0] == 'error':
+                    description = found[1]
+                elif found[0] != expected[0]:
+                    description = 'the .lint.csv files differ'
+                else:
+                    description = 'the quality score is %s, not %s' % \
+                        (found[1], expected[1])
+                differences.append((case, name, description))
+                if keep_directory is not None:
+                    if not os.path.isdir(keep_directory):
+                        os.makedirs(keep_directory)
+                    with open(os.path.join(keep_directory, 'case-%d.py' %
+                                           case), 'wb') as kept:
+                        kept.write(source_bytes)
+    finally:
+        shutil.rmtree(directory)
+    return compared, differences
+
+
+def prescan_misses(python_filename, source_bytes):
+    '''
+    Checks the answer of token_checks_possible from utils.py for one
+    program against what the tokenizer finds in it.
+
+    Parameters:
+
+        python_filename: The name to give the program.
+        source_bytes: The contents of the program, as bytes.
+
+    Result: None if the program does not tokenize. Otherwise a 2-tuple
+    of the answer of token_checks_possible, and a list of the error
+    types it ruled out that the tokenizer found, which should always
+    be empty.
+    '''
+    try:
+        encoding, lines = split_source(source_bytes)
+        variables, indents = vars_indents(python_filename, lines, encoding)
+    except (TokenError, SyntaxError, UnicodeDecodeError):
+        return None
+    answer = token_checks_possible(source_bytes, encoding)
+    misses = []
+    if not answer[0] and any(len(each_variable[0]) == 1
+                             for each_line in variables.values()
+                             for each_variable in each_line):
+        misses.append("SINGLE_CHAR_VAR")
+    if not answer[1] and any(lint.check_bad_indent(line_number, indent,
+                                                   lines, encoding)
+                             for (line_number, indent) in indents.items()):
+        misses.append("BAD_INDENT")
+    return answer, misses
+
+
+def compare_prescan(num_cases=200, seed=0, fuzz_fraction=0.3,
+                    directories=(), keep_directory=None):
+    '''
+    Checks that token_checks_possible from utils.py never rules out
+    an error type that the tokenizer finds, in num_cases random
+    programs and in every .py file under the given directories.
+    Every other random program has only names of more than one ASCII
+    character, so that the single character variables can be ruled
+    out.
+
+    Parameters:
+
+        num_cases: The number of random programs to make.
+        seed: The seed of the random programs.
+        fuzz_fraction: The fraction of programs that are fuzzed.
+        directories: The directories to check every .py file under.
+        keep_directory: A directory to copy every random program that
+                        was missed to, or None.
+
+    Result: A 2-tuple of a dictionary with the number of programs that
+    tokenized under the key "CHECKED" and the number that each error
+    type was ruled out of under its own key, and a list of (program,
+    error type) tuples, one for each miss, where program is the case
+    number or the name of the file.
+
+    Example:
+    num_cases = 2000
+    directories = ['/usr/lib/python3.11']
+
+    >>>({'CHECKED': 5817, 'SINGLE_CHAR_VAR': 1879, 'BAD_INDENT': 2709}, [])
+    '''
+    rng = random.Random(seed)
+    counts = {"CHECKED": 0, "SINGLE_CHAR_VAR": 0, "BAD_INDENT": 0}
+    misses = []
+
+    def check(program, python_filename, source_bytes):
+        result = prescan_misses(python_filename, source_bytes)
+        if result is None:
+            return False
+        answer, program_misses = result
+        counts["CHECKED"] += 1
+        counts["SINGLE_CHAR_VAR"] += not answer[0]
+        counts["BAD_INDENT"] += not answer[1]
+        misses.extend((program, error_type) for error_type in program_misses)
+        return bool(program_misses)
+
+    for case in range(num_cases):
+        names = ASCII_LONG_NAMES if case % 2 else None
+        source = random_source(rng, names)
+        if rng.random() < fuzz_fraction:
+            source = fuzz_source(source, rng)
+        source_bytes = source.encode('utf-8')
+        if check(case, 'case-%d.py' % case, source_bytes) and \
+                keep_directory is not None:
+            if not os.path.isdir(keep_directory):
+                os.makedirs(keep_directory)
+            with open(os.path.join(keep_directory, 'case-%d.py' % case),
+                      'wb') as kept:
+                kept.write(source_bytes)
+
+    for directory in directories:
+        for (dirpath, dirnames, filenames) in os.walk(directory):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if not filename.endswith('.py'):
+                    continue
+                python_filename = os.path.join(dirpath, filename)
+                try:
+                    with open(python_filename, 'rb') as python_file:
+                        source_bytes = python_file.read()
+                except OSError:
+                    continue
+                check(python_filename, python_filename, source_bytes)
+    return counts, misses
+
+
+def main(args):
+    '''
+    Runs compare_engines, or compare_prescan with --prescan, from the
+    command line and writes the number of programs every engine was
+    compared on, and every difference, to the screen.
+
+    Parameters:
+
+        args: The command line arguments, without the program name.
+
+    Result: The exit code, 1 if any engine differed, otherwise 0.
+    '''
+    parser = argparse.ArgumentParser(
+        description='Compare the lint engines with the original lint.')
+    parser.add_argument('--cases', type=int, default=200,
+                        help='the number of random programs')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='the seed of the random programs')
+    parser.add_argument('--engine', action='append', dest='engines',
+                        choices=sorted(ENGINES),
+                        help='an engine to compare, all of them by default')
+    parser.add_argument('--fuzz', type=float, default=0.3,
+                        help='the fraction of programs that are fuzzed')
+    parser.add_argument('--keep', metavar='DIRECTORY',
+                        help='keep the programs that differed here')
+    parser.add_argument('--prescan', action='store_true',
+                        help='check token_checks_possible against the '
+                             'tokenizer instead of comparing engines')
+    parser.add_argument('--walk', action='append', dest='directories',
+                        default=[], metavar='DIRECTORY',
+                        help='with --prescan, also check every .py file '
+                             'under this directory')
+    options = parser.parse_args(args)
+
+    if options.prescan:
+        counts, misses = compare_prescan(options.cases, options.seed,
+                                         options.fuzz, options.directories,
+                                         options.keep)
+        for (program, error_type) in misses:
+            print('%s: %s was ruled out but found' % (program, error_type))
+        print('prescan: %d checked, SINGLE_CHAR_VAR ruled out of %d, '
+              'BAD_INDENT ruled out of %d, %d missed' %
+              (counts["CHECKED"], counts["SINGLE_CHAR_VAR"],
+               counts["BAD_INDENT"], len(misses)))
+        return 1 if misses else 0
+    if options.directories:
+        parser.error('--walk can only be used with --prescan')
+
+    compared, differences = compare_engines(options.cases, options.seed,
+                                            options.engines, options.fuzz,
+                                            options.keep)
+    for (case, name, description) in differences:
+        print('case %d: %s: %s' % (case, name, description))
+    for name in sorted(compared):
+        num_differences = sum(1 for each in differences if each[1] == name)
+        print('%s: %d compared, %d differed' % (name, compared[name],
+                                                num_differences))
+    return 1 if differences else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
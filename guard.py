@@ -0,0 +1,449 @@
+'''
+Guard.
+
+This program lints a batch of python files, such as every file of
+a repository in a CI job, without letting one pathological file
+stall or crash the whole run. Machine-generated files can have a
+single line of many megabytes, or not tokenize at all, and
+vars_indents from utils.py does no error checking of its own.
+
+Every file is linted within limits on:
+
+    Size - a file with more bytes than the limit is not read at all.
+
+    Line length - a line with more bytes than the limit is still
+    checked for being long and for trailing whitespace, but it is
+    measured in pieces instead of being decoded into one giant
+    string, and the file is not tokenized.
+
+    Time - the checks look at the clock as the lines are checked and
+    as they go into the tokenizer, and stop once the file has taken
+    longer than the limit. With a memory limit, a child process that
+    is still running well after the limit is stopped.
+
+    Memory - if a memory limit is given, every file is linted in a
+    child process whose address space is limited, so a file that
+    needs too much memory only stops that process.
+
+A file that goes over a limit, or that cannot be tokenized, still
+gets the instances found in it so far, from the line checks at the
+least. Every problem is written to an errors csv file, with the
+name of the file, the type of error, the line it happened on, if
+known, and a description.
+'''
+import codecs
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, \
+    TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from tokenize import TokenError
+from lint import FIND_ORDER, generate_instances, write_lint_csv, \
+    write_line_index, write_quality_score_log
+from sinks import write_instances
+from utils import read_source
+
+try:
+    import resource
+except ImportError:
+    # The resource module only exists on Unix, where the memory limit
+    # of a process can be set.
+    resource = None
+
+# The default limits of a file.
+MAX_FILE_BYTES = 10 * 1024 * 1024
+MAX_LINE_BYTES = 64 * 1024
+MAX_SECONDS = 60
+
+# The number of lines checked between looks at the clock.
+CHECK_EVERY = 1024
+
+# The number of seconds a child process is given after the time limit
+# to stop by itself, and write what it found, before it is stopped.
+STOP_GRACE_SECONDS = 1
+
+# The number of bytes of an oversized line that are decoded at a time
+# to count its characters, and the number written to the csv file.
+CHUNK_BYTES = 64 * 1024
+SOURCE_PREFIX_BYTES = 1024
+
+# The characters removed from the end of an oversized line to find
+# where its trailing whitespace starts.
+WHITESPACE_BYTES = b' \t\n\r\f\v'
+
+
+class ResourceLimitError(Exception):
+    '''
+    Raised when a python file goes over one of the limits of a
+    guarded lint. error_type is the type of error written to the
+    errors csv file, and line_number is the line the limit was
+    reached on, or None.
+    '''
+
+    def __init__(self, error_type, message, line_number=None):
+        Exception.__init__(self, message)
+        self.error_type = error_type
+        self.line_number = line_number
+
+
+def check_deadline(deadline, line_number):
+    '''
+    Raises ResourceLimitError if the deadline, a time.monotonic()
+    time, has passed. A deadline of None never passes.
+    '''
+    if deadline is not None and time.monotonic() > deadline:
+        raise ResourceLimitError('TIME_LIMIT', 'took longer than the '
+                                 'time limit', line_number)
+
+
+def count_characters(each_line, encoding):
+    '''
+    Counts the characters of a line of bytes by decoding it a piece
+    at a time, so that no string as long as the line is ever built.
+
+    Parameters:
+
+        each_line: The line, as bytes.
+        encoding: The encoding of the line.
+
+    Result: The number of characters in the line.
+
+    Example:
+    each_line = b'x = "caf\\xc3\\xa9"\\n'
+    encoding = 'utf-8'
+
+    >>>11
+    '''
+    if each_line.isascii():
+        return len(each_line)
+    decoder = codecs.getincrementaldecoder(encoding)('replace')
+    view = memoryview(each_line)
+    num_characters = 0
+    for start in range(0, len(each_line), CHUNK_BYTES):
+        num_characters += len(decoder.decode(view[start:start +
+                                                  CHUNK_BYTES]))
+    return num_characters + len(decoder.decode(b'', True))
+
+
+def check_oversized_line(line_number, each_line, encoding):
+    '''
+    Checks a line that is longer than the line length limit for being
+    long and for trailing whitespace, like check_long_line and
+    check_trail_whitespace from lint.py, but without decoding the
+    whole line. Only the start of the line is written as its contents,
+    followed by ' ...'.
+
+    Parameters:
+
+        line_number: The line number of the line.
+        each_line: The contents of the line, as bytes, including the
+                   newline.
+        encoding: The encoding of the line.
+
+    Result: A list of the LONG_LINE and TRAIL_WHITESPACE instances of
+    the line, which can be empty.
+    '''
+    text = each_line[:SOURCE_PREFIX_BYTES].decode(encoding, 'replace')
+    text = text.rstrip('\n') + ' ...'
+    instances = []
+    line_length = count_characters(each_line, encoding)
+    if line_length >= 80:
+        instances.append(["LONG_LINE", line_number, "", line_length - 1,
+                          text])
+    if each_line.endswith((b' \n', b'\t\n')):
+        end = len(each_line)
+        while end > 0 and each_line[end - 1] in WHITESPACE_BYTES:
+            end -= 1
+        instances.append(["TRAIL_WHITESPACE", line_number,
+                          line_length - (len(each_line) - end) + 1, '',
+                          text])
+    return instances
+
+
+class DeadlineLines(list):
+    '''
+    The lines of a python file, as a list, that look at the clock
+    every CHECK_EVERY lines whenever they are iterated over. The
+    tokenizer reads the lines one at a time, so it stops at the
+    deadline even in a long stretch of a file with no variables or
+    indents in it, such as a list of a million numbers.
+    '''
+
+    def __init__(self, lines, deadline):
+        list.__init__(self, lines)
+        self.deadline = deadline
+
+    def __iter__(self):
+        line_count = 0
+        for each_line in list.__iter__(self):
+            line_count += 1
+            if line_count % CHECK_EVERY == 0:
+                check_deadline(self.deadline, line_count)
+            yield each_line
+
+
+def guarded_instances(python_filename, source, encoding, lines,
+                      max_line_bytes=MAX_LINE_BYTES, deadline=None):
+    '''
+    Finds every instance of the 4 bad programming styles in the
+    contents of an input python file, as find_all_instances in
+    lint.py does, but within a line length limit and a deadline,
+    and without stopping at a line that cannot be tokenized.
+
+    Lines longer than max_line_bytes are checked first, with
+    check_oversized_line. The other instances are found with
+    generate_instances from lint.py, which leaves the oversized
+    lines out and does not tokenize the file if there are any. The
+    lines are given to it as DeadlineLines, so the deadline is
+    checked both by the line checks and as the lines go into the
+    tokenizer. If the deadline passes, or tokenizing fails, the
+    instances found so far are kept and the problem is returned
+    with them.
+
+    Parameters:
+
+        python_filename: The python file the contents were read from.
+        source: The contents of the python file, as bytes.
+        encoding: The encoding of the python file.
+        lines: The lines of the program, as bytes.
+        max_line_bytes: The number of bytes above which a line is
+                        oversized.
+        deadline: The time.monotonic() time to stop at, or None.
+
+    Result: A 2-tuple of the list of the instances found, sorted by
+    line number in the same order as find_all_instances, and a list
+    of [error type, line number, description] lists, one for each
+    problem, which is empty if there were none.
+
+    Example:
+    python_filename = 'generated.py'
+
+    >>>([[LONG_LINE,3,,52428799,x = [0, 0, 0, 0, ... ], ...],
+        [['LINE_TOO_LONG', 3, 'line 3 is 52428800 bytes long, ...']])
+    '''
+    list_total = []
+    errors = []
+    try:
+        oversized = [line_number for (line_number, each_line) in
+                     enumerate(lines, 1) if len(each_line) > max_line_bytes]
+        for line_number in oversized:
+            check_deadline(deadline, line_number)
+            list_total += check_oversized_line(line_number,
+                                               lines[line_number - 1],
+                                               encoding)
+        if oversized:
+            errors.append(['LINE_TOO_LONG', oversized[0],
+                           'line %d is %d bytes long, more than the limit '
+                           'of %d, so the file was not tokenized' %
+                           (oversized[0], len(lines[oversized[0] - 1]),
+                            max_line_bytes)])
+        for instance in generate_instances(python_filename,
+                                           DeadlineLines(lines, deadline),
+                                           encoding, max_line_bytes):
+            list_total.append(instance)
+    except ResourceLimitError as error:
+        errors.append([error.error_type, error.line_number, str(error)])
+    except (TokenError, SyntaxError, UnicodeDecodeError) as error:
+        # The line checks have all been made by now, so only the
+        # single character variables and bad indents after the error
+        # are missing. A TokenError gives its position in its
+        # arguments instead of a lineno attribute.
+        if isinstance(error, TokenError):
+            line_number = error.args[1][0]
+        else:
+            line_number = getattr(error, 'lineno', None)
+        errors.append(['TOKENIZE_ERROR', line_number, str(error)])
+    except (MemoryError, RecursionError) as error:
+        errors.append(['MEMORY_LIMIT', None, 'ran out of memory: %s' %
+                       (str(error) or type(error).__name__)])
+
+    list_total.sort(key=lambda tup: (tup[1], FIND_ORDER[tup[0]]))
+    return list_total, errors
+
+
+def guarded_lint(python_filename, max_bytes=MAX_FILE_BYTES,
+                 max_line_bytes=MAX_LINE_BYTES, max_seconds=MAX_SECONDS,
+                 formats=None, compress=False):
+    '''
+    Lints one python file within the limits, writing the same files
+    as lint from lint.py, and returns the problems found.
+
+    A file with more than max_bytes bytes, or that cannot be read,
+    is not linted and no files are written for it. Otherwise the
+    instances found by guarded_instances are written, even if the
+    file went over a limit part of the way through.
+
+    Parameters:
+
+        python_filename: The python file to lint.
+        max_bytes: The largest number of bytes of a file to lint.
+        max_line_bytes: The number of bytes above which a line is
+                        oversized.
+        max_seconds: The longest time to spend on the file, or None.
+        formats: The names of the formats to write the instances in as
+                 well as the csv file, from SINKS in sinks.py, or None
+                 for just the csv file.
+        compress: Whether to compress the instances with gzip, when
+                  formats are given.
+
+    Result: A list of [python filename, error type, line number,
+    description] lists, one for each problem, which is empty if there
+    were none.
+
+    Example:
+    python_filename = 'huge.py'
+
+    >>>[['huge.py', 'FILE_TOO_LARGE', None,
+         'the file is 52430112 bytes, more than the limit of 10485760']]
+    '''
+    deadline = None
+    if max_seconds is not None:
+        deadline = time.monotonic() + max_seconds
+    try:
+        file_size = os.path.getsize(python_filename)
+        if file_size > max_bytes:
+            raise ResourceLimitError('FILE_TOO_LARGE',
+                                     'the file is %d bytes, more than the '
+                                     'limit of %d' % (file_size, max_bytes))
+        source, encoding, lines = read_source(python_filename)
+    except ResourceLimitError as error:
+        return [[python_filename, error.error_type, error.line_number,
+                 str(error)]]
+    except (OSError, SyntaxError) as error:
+        # detect_encoding raises SyntaxError for an unknown encoding.
+        return [[python_filename, 'READ_ERROR', None, str(error)]]
+
+    list_total, errors = guarded_instances(python_filename, source,
+                                           encoding, lines, max_line_bytes,
+                                           deadline)
+    if formats is None:
+        write_lint_csv(python_filename, list_total)
+    else:
+        write_instances(python_filename[:-2], python_filename, list_total,
+                        formats, compress)
+    write_line_index(python_filename, source, encoding)
+    write_quality_score_log(python_filename, list_total, lines)
+    return [[python_filename] + each_error for each_error in errors]
+
+
+def limit_memory(max_memory):
+    '''
+    Limits the address space of the current process to max_memory
+    bytes. Used to start the child processes of lint_batch.
+    '''
+    resource.setrlimit(resource.RLIMIT_AS, (max_memory, max_memory))
+
+
+def stop_executor(executor):
+    '''
+    Shuts down a ProcessPoolExecutor without waiting for the file its
+    child process is linting, by terminating the child process.
+    ProcessPoolExecutor has no public way to stop a task once it has
+    started, so the process is found in its _processes.
+    '''
+    for process in list(executor._processes.values()):
+        process.terminate()
+    executor.shutdown()
+
+
+def lint_batch(python_filenames, errors_filename='lint.errors.csv',
+               max_bytes=MAX_FILE_BYTES, max_line_bytes=MAX_LINE_BYTES,
+               max_seconds=MAX_SECONDS, max_memory=None, formats=None,
+               compress=False):
+    '''
+    Lints a batch of python files with guarded_lint, and writes every
+    problem found to an errors csv file, with the header:
+
+        ["FILENAME", "ERROR_TYPE", "LINE_NUMBER", "DETAIL"]
+
+    The error types are FILE_TOO_LARGE, READ_ERROR, LINE_TOO_LONG,
+    TIME_LIMIT, TOKENIZE_ERROR and MEMORY_LIMIT.
+
+    If max_memory is given, the files are linted one at a time in a
+    child process whose address space is limited to max_memory bytes.
+    If the child process dies, the file it was linting gets a
+    MEMORY_LIMIT error and a new child process lints the rest. If
+    the child process is still linting a file STOP_GRACE_SECONDS
+    after max_seconds, for example because it is stuck where it
+    cannot look at the clock, it is stopped, the file gets a
+    TIME_LIMIT error and a new child process lints the rest.
+
+    Parameters:
+
+        python_filenames: The python files to lint.
+        errors_filename: The name of the errors csv file to write.
+        max_bytes: The largest number of bytes of a file to lint.
+        max_line_bytes: The number of bytes above which a line is
+                        oversized.
+        max_seconds: The longest time to spend on each file, or None.
+        max_memory: The address space limit of the child process in
+                    bytes, or None to lint in this process.
+        formats: The names of the formats to write the instances in as
+                 well as the csv file, from SINKS in sinks.py, or None
+                 for just the csv file.
+        compress: Whether to compress the instances with gzip, when
+                  formats are given.
+
+    Result: The list of all the problems, as written to the errors
+    csv file.
+
+    Example:
+    python_filenames = ['naughty.py', 'huge.py']
+
+    >>>[['huge.py', 'FILE_TOO_LARGE', None,
+         'the file is 52430112 bytes, more than the limit of 10485760']]
+
+    Creates naughty.lint.csv and so on, as lint does, and lint.errors.csv
+    '''
+    executor = None
+    timeout = None
+    if max_seconds is not None:
+        timeout = max_seconds + STOP_GRACE_SECONDS
+    if max_memory is not None:
+        if resource is None:
+            raise ValueError('a memory limit needs the resource module, '
+                             'which this platform does not have')
+        executor = ProcessPoolExecutor(1, initializer=limit_memory,
+                                       initargs=(max_memory,))
+    all_errors = []
+    try:
+        for python_filename in python_filenames:
+            if executor is None:
+                all_errors += guarded_lint(python_filename, max_bytes,
+                                           max_line_bytes, max_seconds,
+                                           formats, compress)
+                continue
+            try:
+                all_errors += executor.submit(
+                    guarded_lint, python_filename, max_bytes,
+                    max_line_bytes, max_seconds, formats,
+                    compress).result(timeout)
+            except BrokenProcessPool:
+                all_errors.append([python_filename, 'MEMORY_LIMIT', None,
+                                   'the process linting the file stopped'])
+                executor.shutdown()
+                executor = ProcessPoolExecutor(1, initializer=limit_memory,
+                                               initargs=(max_memory,))
+            except FutureTimeoutError:
+                all_errors.append([python_filename, 'TIME_LIMIT', None,
+                                   'the process linting the file took '
+                                   'longer than the time limit'])
+                stop_executor(executor)
+                executor = ProcessPoolExecutor(1, initializer=limit_memory,
+                                               initargs=(max_memory,))
+            except MemoryError as error:
+                all_errors.append([python_filename, 'MEMORY_LIMIT', None,
+                                   'ran out of memory: %s' %
+                                   (str(error) or 'MemoryError')])
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    errors_file = open(errors_filename, 'w')
+    writer = csv.writer(errors_file)
+    writer.writerow(["FILENAME", "ERROR_TYPE", "LINE_NUMBER", "DETAIL"])
+    for each_error in all_errors:
+        writer.writerow(each_error)
+    errors_file.close()
+    return all_errors
@@ -37,11 +37,38 @@ Revision history:
 
 '''
 
+import argparse
 import csv
-from utils import vars_indents, get_current_date_time
-
-
-def find_single_char_variable(python_filename, lines):
+import os
+import sys
+from token import NAME
+from utils import vars_indents, generate_vars_indents, get_current_date_time, \
+    token_checks_possible, read_source, line_offsets, token_tables
+from sinks import SINKS, write_instances
+try:
+    import numpy
+except ImportError:
+    # numpy is optional. Without it the token tables are searched with
+    # a Python loop instead.
+    numpy = None
+
+# The penalty each instance of bad programming style adds to the total
+# penalty used to calculate the quality score.
+PENALTY_WEIGHTS = {"TRAIL_WHITESPACE": 1, "SINGLE_CHAR_VAR": 2,
+                   "BAD_INDENT": 4, "LONG_LINE": 5}
+
+# The order find_all_instances lists the instances of one line in,
+# after sorting them by line number.
+FIND_ORDER = {"SINGLE_CHAR_VAR": 0, "LONG_LINE": 1, "TRAIL_WHITESPACE": 2,
+              "BAD_INDENT": 3}
+
+# The exit codes of the gate function.
+GATE_PASS = 0
+GATE_FAIL = 1
+
+
+def find_single_char_variable(python_filename, lines, encoding=None,
+                              tables=None):
     '''
     Finds the number of single character variables in the input python file
     and returns a list containing the variables and further information about
@@ -76,11 +103,19 @@ def find_single_char_variable(python_filename, lines):
 
     The list is then returned at the end of the function.
 
+    When the token tables of the program are given, the variables are
+    found in them by single_char_variable_indices instead, and the
+    program is not tokenized again.
+
     Parameters:
 
         python_filename: The python file you want tested to find
                          instances of bad programming style.
         lines: The lines of the program
+        encoding: The encoding of lines if they are bytes, as found by
+                  read_source in utils.py, or None if they are strings.
+        tables: The token tables of the program, as returned by
+                token_tables in utils.py, or None to tokenize it.
 
     Result: A list of all the instances of single variables in the
     input python file, with the information including the title
@@ -129,20 +164,79 @@ def find_single_char_variable(python_filename, lines):
     [SINGLE_CHAR_VAR,354,21,c,    return image[r][c]]]
     '''
 
-    variable_dictionary = vars_indents(python_filename)
+    if tables is not None:
+        variable_lines = tables["VARIABLE_LINES"]
+        variable_columns = tables["VARIABLE_COLUMNS"]
+        variable_names = tables["VARIABLE_NAMES"]
+        names = tables["NAMES"]
+        return [["SINGLE_CHAR_VAR", variable_lines[index],
+                 variable_columns[index], names[variable_names[index]],
+                 source_text(lines[variable_lines[index]-1], encoding)[:-1]]
+                for index in single_char_variable_indices(tables)]
+
+    variable_dictionary = tokenize_lines(python_filename, lines, encoding)
     single_char_var_list = []
 
     for each_key in variable_dictionary[0].keys():
         for each_variable in variable_dictionary[0][each_key]:
-            if len(each_variable[0]) == 1:
-                single_char_var_list.append(["SINGLE_CHAR_VAR",
-                                            int(each_key), each_variable[1],
-                                            each_variable[0],
-                                            lines[each_key-1][:-1]])
+            instance = check_single_char_variable(each_key, each_variable,
+                                                  lines, encoding)
+            if instance:
+                single_char_var_list.append(instance)
     return single_char_var_list
 
 
-def find_long_line(python_filename, lines):
+def single_char_variable_indices(tables):
+    '''
+    Returns the indices in the token tables of every variable whose
+    name is a single character, in the order the variables appear.
+    Each name is checked once, and with numpy the variables are then
+    picked out by their name IDs without a Python loop.
+
+    Parameters:
+
+        tables: The token tables of a program, as returned by
+                token_tables in utils.py.
+
+    Result: A list of indices into the VARIABLE_ arrays of the tables.
+    '''
+    single_names = [len(name) == 1 for name in tables["NAMES"]]
+    variable_names = tables["VARIABLE_NAMES"]
+    if numpy is not None and len(variable_names) > 0:
+        name_ids = numpy.frombuffer(variable_names,
+                                    dtype=variable_names.typecode)
+        return numpy.flatnonzero(
+            numpy.array(single_names, dtype=bool)[name_ids]).tolist()
+    return [index for (index, name_id) in enumerate(variable_names)
+            if single_names[name_id]]
+
+
+def check_single_char_variable(line_number, variable, lines, encoding=None):
+    '''
+    Checks one variable, as found by vars_indents, and returns the
+    SINGLE_CHAR_VAR instance for it, or None if the variable name is
+    longer than a single character.
+
+    Parameters:
+
+        line_number: The line number the variable appears on.
+        variable: A 2-tuple of the variable name and its column number.
+        lines: The lines of the program
+        encoding: The encoding of lines if they are bytes, as found by
+                  read_source in utils.py, or None if they are strings.
+
+    Result: A list with the title SINGLE_CHAR_VAR, the line number,
+    the column number, the single variable itself, and the entire
+    contents of the line, or None.
+    '''
+    if len(variable[0]) == 1:
+        return ["SINGLE_CHAR_VAR", int(line_number), variable[1],
+                variable[0],
+                source_text(lines[line_number-1], encoding)[:-1]]
+    return None
+
+
+def find_long_line(python_filename, lines, encoding=None):
     '''
     Finds the instances of long lines in an input python file and then returns
     a list containing instances and further information about them.
@@ -172,6 +266,8 @@ def find_long_line(python_filename, lines):
         python_filename: The python file you want tested to find
                          instances of bad programming style.
         lines: The lines of the program
+        encoding: The encoding of lines if they are bytes, as found by
+                  read_source in utils.py, or None if they are strings.
 
     Result: A list of all the instances of long lines in the input python file,
     with the information including the title LONG_LINE, the line number,
@@ -198,15 +294,43 @@ def find_long_line(python_filename, lines):
     line_count = 0
 
     for each_line in lines:
-        line_length = sum(1 for char in each_line)
         line_count += 1
-        if line_length >= 80:
-            long_line_list.append(["LONG_LINE", int(line_count), "",
-                                  (line_length - 1), each_line[:-1]])
+        instance = check_long_line(line_count, each_line, encoding)
+        if instance:
+            long_line_list.append(instance)
     return long_line_list
 
 
-def find_trail_whitespace(python_filename, lines):
+def check_long_line(line_number, each_line, encoding=None):
+    '''
+    Checks one line of the program and returns the LONG_LINE instance
+    for it, or None if the line is not too long.
+
+    Parameters:
+
+        line_number: The line number of the line.
+        each_line: The contents of the line, including the newline.
+        encoding: The encoding of each_line if it is bytes, as found by
+                  read_source in utils.py, or None if it is a string.
+
+    Result: A list with the title LONG_LINE, the line number,
+    the length of the long line, and the entire contents of the line,
+    or None.
+    '''
+    line_length = len(each_line)
+    # A line never has more characters than bytes, so a line of bytes
+    # only needs to be decoded to count its characters if it is long and
+    # not plain ASCII.
+    if encoding is not None and line_length >= 80 and \
+            not each_line.isascii():
+        line_length = len(source_text(each_line, encoding))
+    if line_length >= 80:
+        return ["LONG_LINE", int(line_number), "",
+                (line_length - 1), source_text(each_line, encoding)[:-1]]
+    return None
+
+
+def find_trail_whitespace(python_filename, lines, encoding=None):
     '''
     Finds the instances of trailing white space in the input python file and
     then returns the instances in the form of a list.
@@ -239,6 +363,8 @@ def find_trail_whitespace(python_filename, lines):
         python_filename: The python file you want tested to find
                          instances of bad programming style.
         lines: The lines of the program
+        encoding: The encoding of lines if they are bytes, as found by
+                  read_source in utils.py, or None if they are strings.
 
     Result: A list of all the instances of trailing whitespace
     in the input python file, with the information including
@@ -277,19 +403,46 @@ def find_trail_whitespace(python_filename, lines):
 
     for each_line in lines:
         line_count += 1
+        instance = check_trail_whitespace(line_count, each_line, encoding)
+        if instance:
+            trail_whitespace_list.append(instance)
+
+    return trail_whitespace_list
+
+
+def check_trail_whitespace(line_number, each_line, encoding=None):
+    '''
+    Checks one line of the program and returns the TRAIL_WHITESPACE
+    instance for it, or None if the line has no trailing whitespace.
+
+    Parameters:
+
+        line_number: The line number of the line.
+        each_line: The contents of the line, including the newline.
+        encoding: The encoding of each_line if it is bytes, as found by
+                  read_source in utils.py, or None if it is a string.
+
+    Result: A list with the title TRAIL_WHITESPACE, the line number,
+    the column number where the first trailing whitespace occurs,
+    and the entire contents of the line, or None.
+    '''
+    if encoding is not None:
+        found = each_line.endswith((b' \n', b'\t\n'))
+    else:
+        found = ' \n' in each_line or '\t\n' in each_line
+    if found:
+        each_line = source_text(each_line, encoding)
         # Strips all the white space on the right side of the line
         # and finds the length of this string.
         # We add 1 because we disignate the column as the position
         # with the first of the trailing whitespace.
         column_num = len(each_line.rstrip()) + 1
-        if ' \n' in each_line or '\t\n' in each_line:
-            trail_whitespace_list.append(["TRAIL_WHITESPACE", int(line_count),
-                                         column_num, '', each_line[:-1]])
-
-    return trail_whitespace_list
+        return ["TRAIL_WHITESPACE", int(line_number),
+                column_num, '', each_line[:-1]]
+    return None
 
 
-def find_bad_indent(python_filename, lines):
+def find_bad_indent(python_filename, lines, encoding=None, tables=None):
     '''
     Finds the instances of bad indents in the input python file and then
     returns the instances in the form of a list.
@@ -320,11 +473,19 @@ def find_bad_indent(python_filename, lines):
     immediately after the indentation, the entire contents of the line
     containing the instance of the bad indent.
 
+    When the token tables of the program are given, the indents are
+    found in them by bad_indent_lines instead, and the program is not
+    tokenized again.
+
     Parameters:
 
         python_filename: The python file you want tested to find
                          instances of bad programming style.
         lines: The lines of the program
+        encoding: The encoding of lines if they are bytes, as found by
+                  read_source in utils.py, or None if they are strings.
+        tables: The token tables of the program, as returned by
+                token_tables in utils.py, or None to tokenize it.
 
     Result:
     A list called bad_indents_list containing the information from
@@ -353,18 +514,118 @@ def find_bad_indent(python_filename, lines):
     [BAD_INDENT,581,6,,     ''Run all the test cases.'']]
     '''
 
-    variable_dictionary = vars_indents(python_filename)
+    if tables is not None:
+        indent_widths = tables["INDENT_WIDTHS"]
+        return [["BAD_INDENT", line_number, indent_widths[line_number] + 1,
+                 '', source_text(lines[line_number-1], encoding)[:-1]]
+                for line_number in bad_indent_lines(tables)]
+
+    variable_dictionary = tokenize_lines(python_filename, lines, encoding)
     bad_indent_list = []
 
     for each_key in variable_dictionary[1].keys():
-        for indent in variable_dictionary[1][each_key]:
-            if (str(indent).count(' ') % 4) > 0 or '\t' in str(indent):
-                bad_indent_list.append(["BAD_INDENT", int(each_key),
-                                       variable_dictionary[1][each_key][1],
-                                       '', lines[each_key-1][:-1]])
+        instance = check_bad_indent(each_key,
+                                    variable_dictionary[1][each_key], lines,
+                                    encoding)
+        if instance:
+            bad_indent_list.append(instance)
     return bad_indent_list
 
 
+def bad_indent_lines(tables):
+    '''
+    Returns the line numbers of every indent in the token tables that
+    is not a multiple of 4 single spaces, in order. With numpy the whole
+    tables are checked at once instead of one line at a time.
+
+    Parameters:
+
+        tables: The token tables of a program, as returned by
+                token_tables in utils.py.
+
+    Result: A list of line numbers.
+    '''
+    widths = tables["INDENT_WIDTHS"]
+    spaces = tables["INDENT_SPACES"]
+    tabs = tables["INDENT_TABS"]
+    if numpy is not None:
+        widths = numpy.frombuffer(widths, dtype=widths.typecode)
+        spaces = numpy.frombuffer(spaces, dtype=spaces.typecode)
+        tabs = numpy.frombuffer(tabs, dtype=tabs.typecode)
+        return numpy.flatnonzero(
+            (widths > 0) & ((spaces % 4 > 0) | (tabs > 0))).tolist()
+    return [line_number for line_number in range(len(widths))
+            if widths[line_number] > 0 and
+            (spaces[line_number] % 4 > 0 or tabs[line_number] > 0)]
+
+
+def check_bad_indent(line_number, indent, lines, encoding=None):
+    '''
+    Checks one indent, as found by vars_indents, and returns the
+    BAD_INDENT instance for it, or None if the indent is a multiple
+    of 4 single spaces.
+
+    Parameters:
+
+        line_number: The line number the indent appears on.
+        indent: A 2-tuple of the text of the indent and the column
+                number immediately after the indent.
+        lines: The lines of the program
+        encoding: The encoding of lines if they are bytes, as found by
+                  read_source in utils.py, or None if they are strings.
+
+    Result: A list with the title BAD_INDENT, the line number,
+    the column number immediately after the indentation, and the
+    entire contents of the line, or None.
+    '''
+    for each_part in indent:
+        if (str(each_part).count(' ') % 4) > 0 or '\t' in str(each_part):
+            return ["BAD_INDENT", int(line_number), indent[1],
+                    '', source_text(lines[line_number-1], encoding)[:-1]]
+    return None
+
+
+def source_text(each_line, encoding):
+    '''
+    Returns a line of the program as a string. Lines read as bytes
+    are decoded, and any bytes which are not valid in the encoding
+    are replaced, so that one badly encoded line cannot stop the
+    instances in the rest of the file from being written.
+
+    Parameters:
+
+        each_line: A line of the program, as a string or as bytes.
+        encoding: The encoding of each_line if it is bytes, or None.
+
+    Result: The line as a string.
+    '''
+    if encoding is None:
+        return each_line
+    return each_line.decode(encoding, 'replace')
+
+
+def tokenize_lines(python_filename, lines, encoding):
+    '''
+    Returns the variables and indents of the program, found by
+    vars_indents from utils.py. Lines read as bytes are tokenized
+    directly, instead of reading the file again. Lines given as
+    strings are left alone, and the file is read by vars_indents.
+
+    Parameters:
+
+        python_filename: The python file you want tested to find
+                         instances of bad programming style.
+        lines: The lines of the program
+        encoding: The encoding of lines if they are bytes, as found by
+                  read_source in utils.py, or None if they are strings.
+
+    Result: The 2-tuple of dictionaries returned by vars_indents.
+    '''
+    if encoding is None:
+        return vars_indents(python_filename)
+    return vars_indents(python_filename, lines, encoding)
+
+
 def find_num_instances(list_total):
     '''
     Calculates the number of instances of each type of bad
@@ -410,6 +671,41 @@ def find_num_instances(list_total):
             num_bad_indent, num_long_line)
 
 
+def calculate_quality_score(total_penalty, num_lines):
+    '''
+    Calculates the quality score out of 10 for a total penalty
+    and a number of lines, using the equation described in
+    write_quality_score_log:
+
+    maximum of (0, 10 - (( total penalty / number of lines ) x 10 ))
+
+    If the total penalty is 0 the score is 10, even if there are
+    0 lines in the file, so we never divide by 0.
+
+    Parameters:
+
+        total_penalty: The sum of the PENALTY_WEIGHTS of every instance
+                       of bad programming style.
+        num_lines: The number of lines in the input python file.
+
+    Result: The quality score as a string, limited to 2 decimal points.
+
+    Example:
+    total_penalty = 136
+    num_lines = 612
+
+    >>>'7.78'
+    '''
+    # To prevent an error occuring if there are 0 instances of
+    if total_penalty == 0:
+        score = 0
+    else:
+        score = float(total_penalty) / float(num_lines)
+    
+    # The quality score is limited to 2 decimals points
+    return "%.2f" % (max(0, 10 - score * 10))
+
+
 def write_quality_score_log(python_filename, list_total, lines):
     '''
     Creates a csv file with a score out of 10 representing
@@ -484,13 +780,6 @@ def write_quality_score_log(python_filename, list_total, lines):
     
     >>>None
     '''
-    quality_filename = python_filename[:-2] + 'score.csv'
-    
-    # The quality score file is opend in append mode so the
-    # existing contents in the file are not over-written
-    quality_file = open(quality_filename, 'a')
-    writer = csv.writer(quality_file)
-    
     total_penalty = find_num_instances(list_total)[0] * 1 +\
                     find_num_instances(list_total)[1] * 2 +\
                     find_num_instances(list_total)[2] * 4 +\
@@ -499,14 +788,33 @@ def write_quality_score_log(python_filename, list_total, lines):
     # Counts the total number of lines in the input python file
     num_lines = sum(1 for each_line in lines)
     
-    # To prevent an error occuring if there are 0 instances of
-    if total_penalty == 0:
-        score = 0
-    else:
-        score = float(total_penalty) / float(num_lines)
+    quality_score = calculate_quality_score(total_penalty, num_lines)
+    append_quality_score(python_filename, quality_score)
+
+
+def append_quality_score(python_filename, quality_score):
+    '''
+    Appends the current date and time and a quality score to the
+    python_filename[:-2] + 'score.csv' log, creating the log if it
+    does not exist already.
+
+    Parameters:
+
+        python_filename: The python file the quality score is for.
+        quality_score: The quality score, as a string.
+
+    Example:
+    python_filename = 'naughty.py'
+    quality_score = '7.78'
+
+    >>>None
+    '''
+    quality_filename = python_filename[:-2] + 'score.csv'
     
-    # The quality score is limited to 2 decimals points
-    quality_score = "%.2f" % (max(0, 10 - score * 10))
+    # The quality score file is opend in append mode so the
+    # existing contents in the file are not over-written
+    quality_file = open(quality_filename, 'a')
+    writer = csv.writer(quality_file)
     
     # Writes the current date and time and the quality score
     # to the csv score file
@@ -515,7 +823,7 @@ def write_quality_score_log(python_filename, list_total, lines):
     quality_file.close()
 
 
-def lint(python_filename):
+def lint(python_filename, formats=None, compress=False):
     '''
     Creates a csv which lists a few of the instances of
     bad programming style from the given input python file.
@@ -546,9 +854,8 @@ def lint(python_filename):
         5.    write_quality_score_log
     
     A list total of all the instances of the above bad programming styles
-    is created to contain what will be written into the csv file.
-
-    This list of instances is then sorted by the line number, the second value.
+    is created by find_all_instances to contain what will be written
+    into the csv file, sorted by the line number, the second value.
 
     The header is first written into the file:
 
@@ -557,6 +864,16 @@ def lint(python_filename):
     The for loop is used to then write every instance in the list_total
     to the file.
 
+    If formats are given, the instances are also written in each of
+    those formats, such as "jsonl" and "sarif", in one pass by
+    write_instances from sinks.py, compressed with gzip if compress
+    is True. write_instances always writes the .lint.csv file as
+    well, whatever the formats.
+
+    The index of where each line starts is written with
+    write_line_index, so that reports can show the lines around
+    each instance.
+
     The last part of the function calls the write_quality_score_log to
     create the csv log of the quality score.
 
@@ -565,34 +882,133 @@ def lint(python_filename):
 
         python_filename: The python file you want tested to find
                          instances of bad programming style.
+        formats: The names of the formats to write the instances in as
+                 well as the csv file, from SINKS in sinks.py, or None
+                 for just the csv file.
+        compress: Whether to compress the instances with gzip, when
+                  formats are given.
 
     Result:
     Two csv files. One containing every instance of the 4
     bad programming styles. The second, a log of the score out of 10
     for the amount of instances of bad programming styles
-    with the date and time.
+    with the date and time. Also a .lines.idx file with the
+    index of the lines of the input python file.
 
     Example:
     python_filename = 'naughty.py'
 
     >>>None
     '''
-    in_file = open(python_filename)
-    lines = in_file.readlines()
-    out_filename = python_filename[:-2] + 'lint.csv'
-    out_file = open(out_filename, 'w')
-    writer = csv.writer(out_file)
+    source, encoding, lines = read_source(python_filename)
+    list_total = find_all_instances(python_filename, source, encoding,
+                                    lines)
+
+    if formats is None:
+        write_lint_csv(python_filename, list_total)
+    else:
+        write_instances(python_filename[:-2], python_filename, list_total,
+                        formats, compress)
+    write_line_index(python_filename, source, encoding)
+    
+    # Creates the log quality .csv file.
+    write_quality_score_log(python_filename, list_total, lines)
+
+
+def find_all_instances(python_filename, source, encoding, lines):
+    '''
+    Finds every instance of the 4 bad programming styles in the
+    contents of an input python file, as read by read_source from
+    utils.py, without reading or writing any files.
+
+    The single character variable and bad indent checks tokenize the
+    file, so they are skipped when token_checks_possible from utils.py
+    shows that they cannot find anything. Otherwise the file is
+    tokenized once, into the token tables returned by token_tables from
+    utils.py, which both checks then search.
+
+    Parameters:
+
+        python_filename: The python file the contents were read from.
+        source: The contents of the python file, as bytes.
+        encoding: The encoding of the python file.
+        lines: The lines of the program, as bytes.
+
+    Result: A list of all the instances, sorted by line number.
+
+    Example:
+    python_filename = 'naughty.py'
+
+    >>>[[TRAIL_WHITESPACE,4,46,,
+         Author: Bernie Pope (bjpope@unimelb.edu.au). ], ...
+        [BAD_INDENT,581,6,,     ''Run all the test cases.'']]
+    '''
+    # Finds out cheaply whether tokenizing the file could find any
+    # single character variables or bad indents at all.
+    variables_possible, indents_possible = \
+        token_checks_possible(source, encoding)
+
+    tables = None
+    if variables_possible or indents_possible:
+        tables = token_tables(python_filename, lines, encoding)
 
     list_total = []
     
     # Adds all the instances to the list_total.
-    list_total += find_single_char_variable(python_filename, lines)
-    list_total += find_long_line(python_filename, lines)
-    list_total += find_trail_whitespace(python_filename, lines)
-    list_total += find_bad_indent(python_filename, lines)
+    if variables_possible:
+        list_total += find_single_char_variable(python_filename, lines,
+                                                encoding, tables)
+    list_total += find_long_line(python_filename, lines, encoding)
+    list_total += find_trail_whitespace(python_filename, lines, encoding)
+    if indents_possible:
+        list_total += find_bad_indent(python_filename, lines, encoding,
+                                      tables)
 
     # Sorts the list_total by the line number each instance appears in.
     list_total.sort(key=lambda tup: tup[1])
+    return list_total
+
+
+def calculate_total_penalty(list_total):
+    '''
+    Adds up the PENALTY_WEIGHTS of every instance in list_total.
+
+    Parameters:
+
+        list_total: A list containing all the instances of
+                    bad programming styles.
+
+    Result: The total penalty as an integer.
+    '''
+    return sum(PENALTY_WEIGHTS[each_item[0]] for each_item in list_total)
+
+
+def write_lint_csv(python_filename, list_total):
+    '''
+    Writes the instances of bad programming style to the
+    python_filename[:-2] + 'lint.csv' file, overwriting it if it
+    already exists.
+
+    The header is first written into the file:
+
+        ["ERROR_TYPE", "LINE_NUMBER", "COLUMN", "INFO", "SOURCE_LINE"]
+
+    followed by one row for every instance in list_total.
+
+    Parameters:
+
+        python_filename: The python file the instances were found in.
+        list_total: A list containing all the instances of
+                    bad programming styles.
+
+    Example:
+    python_filename = 'naughty.py'
+
+    >>>None
+    '''
+    out_filename = python_filename[:-2] + 'lint.csv'
+    out_file = open(out_filename, 'w')
+    writer = csv.writer(out_file)
 
     # Header is written to the top of the csv file.
     writer.writerow(["ERROR_TYPE", "LINE_NUMBER",
@@ -603,7 +1019,450 @@ def lint(python_filename):
         writer.writerow(each_item)
 
     out_file.close()
-    
-    # Creates the log quality .csv file.
-    write_quality_score_log(python_filename, list_total, lines)
+
+
+def write_line_index(python_filename, source, encoding):
+    '''
+    Writes the python_filename[:-2] + 'lines.idx' file, which
+    records where every line of the input python file starts,
+    so that a report can show the lines around an instance
+    without reading the whole file again.
+
+    The file starts with a line of text giving the encoding of
+    the python file, its size in bytes and its modification time
+    in nanoseconds, followed by the offsets found by line_offsets
+    from utils.py, written as little-endian unsigned 64 bit
+    integers. The modification time is 0 if there is no python
+    file on disk, as for a file linted inside an archive.
+
+    Parameters:
+
+        python_filename: The python file the index is for.
+        source: The contents of the python file, as bytes.
+        encoding: The encoding of the python file.
+
+    Example:
+    python_filename = 'naughty.py'
+
+    >>>None
+
+    Creates a file called naughty.lines.idx
+    '''
+    try:
+        mtime_ns = os.stat(python_filename).st_mtime_ns
+    except OSError:
+        mtime_ns = 0
+    offsets = line_offsets(source)
+    if sys.byteorder == 'big':
+        offsets.byteswap()
+    index_file = open(python_filename[:-2] + 'lines.idx', 'wb')
+    index_file.write(('%s %d %d\n' % (encoding, len(source), mtime_ns))
+                     .encode('ascii'))
+    index_file.write(offsets.tobytes())
+    index_file.close()
+
+
+def generate_instances(python_filename, lines, encoding=None,
+                       max_line_bytes=None):
+    '''
+    Generates the instances of bad programming style in the input
+    python file one at a time, instead of collecting them all
+    into a list first.
+
+    The long line and trailing whitespace checks are made first,
+    in a single pass over the lines, because they are cheap.
+    If the lines are bytes and token_checks_possible from utils.py
+    shows that tokenizing them cannot find anything, that is all.
+    The single character variable and bad indent checks follow,
+    using generate_vars_indents from utils.py so that the lines are
+    only tokenized as far as the caller keeps asking for instances.
+    The lines are tokenized as they are given, so they can also be
+    just a part of the file, in which case the line numbers count
+    from the first line given.
+
+    If max_line_bytes is given, lines with more bytes than that are
+    left out of the long line and trailing whitespace checks, for
+    the caller to check without decoding them, as guard.py does, and
+    if there are any the lines are not tokenized at all.
+
+    Every instance is the same list that the matching find_ function
+    would return, but the instances are not sorted by line number.
+
+    Parameters:
+
+        python_filename: The python file you want tested to find
+                         instances of bad programming style.
+        lines: The lines of the program
+        encoding: The encoding of lines if they are bytes, as found by
+                  read_source in utils.py, or None if they are strings.
+        max_line_bytes: The number of bytes above which a line is
+                        oversized, or None for no limit.
+
+    Result: A generator of instances of bad programming style.
+
+    Example:
+    python_filename = 'naughty.py'
+
+    >>>next(generate_instances(python_filename, lines))
+    ["TRAIL_WHITESPACE", 4, 46, '',
+     "Author: Bernie Pope (bjpope@unimelb.edu.au). "]
+    '''
+    line_count = 0
+    oversized = False
+    for each_line in lines:
+        line_count += 1
+        if max_line_bytes is not None and len(each_line) > max_line_bytes:
+            oversized = True
+            continue
+        instance = check_long_line(line_count, each_line, encoding)
+        if instance:
+            yield instance
+        instance = check_trail_whitespace(line_count, each_line, encoding)
+        if instance:
+            yield instance
+
+    if oversized:
+        return
+    if encoding is not None and \
+            token_checks_possible(b''.join(lines), encoding) == (False, False):
+        return
+
+    for (token_type, line_number, token_info) in \
+            generate_vars_indents(python_filename, lines, encoding):
+        if token_type == NAME:
+            instance = check_single_char_variable(line_number, token_info,
+                                                  lines, encoding)
+        else:
+            instance = check_bad_indent(line_number, token_info, lines,
+                                        encoding)
+        if instance:
+            yield instance
+
+
+def gate(python_filename, min_score=None, blocking=(), max_findings=None,
+         write_csv=False):
+    '''
+    Decides whether an input python file passes a quality gate,
+    for example in a pre-commit hook, and returns GATE_PASS or
+    GATE_FAIL.
+
+    The file fails the gate if any of the following is true:
+
+        1.    its quality score is below min_score
+
+        2.    it has an instance of one of the blocking error types
+
+        3.    it has max_findings or more instances of any type
+
+    The instances are taken one at a time from generate_instances,
+    and the total penalty is added up as they arrive. The penalty
+    can only grow, and so the score can only fall, which means
+    the file has failed as soon as any of the above is true and
+    no further instances need to be found. The file only passes
+    once every instance has been found.
+
+    No csv file is written unless write_csv is True. In that case
+    every instance is always found, so the .lint.csv file and the
+    .score.csv log are the same as the ones written by lint.
+
+    Parameters:
+
+        python_filename: The python file you want to gate.
+        min_score: The lowest passing quality score, or None to
+                   not gate on the score.
+        blocking: A collection of error types, such as "LONG_LINE",
+                  that fail the gate if they appear at all.
+        max_findings: The number of instances that fails the gate,
+                      or None for no limit.
+        write_csv: Whether to write the .lint.csv and .score.csv files.
+
+    Result: GATE_PASS if the file passes the gate, otherwise GATE_FAIL.
+
+    Example:
+    python_filename = 'naughty.py'
+    min_score = 8
+
+    >>>1
+    '''
+    _source, encoding, lines = read_source(python_filename)
+    num_lines = len(lines)
+
+    result = GATE_PASS
+    list_total = []
+    total_penalty = 0
+    for instance in generate_instances(python_filename, lines, encoding):
+        list_total.append(instance)
+        total_penalty += PENALTY_WEIGHTS[instance[0]]
+        if (instance[0] in blocking or
+                (max_findings is not None and
+                 len(list_total) >= max_findings) or
+                (min_score is not None and
+                 float(calculate_quality_score(total_penalty, num_lines)) <
+                 min_score)):
+            result = GATE_FAIL
+            if not write_csv:
+                # The outcome can no longer change, so we stop early.
+                break
+
+    if write_csv:
+        # generate_instances finds the instances in a different order,
+        # so those on the same line are put back in the order that
+        # find_all_instances gives them in.
+        list_total.sort(key=lambda tup: (tup[1], FIND_ORDER[tup[0]]))
+        write_lint_csv(python_filename, list_total)
+        write_quality_score_log(python_filename, list_total, lines)
+
+    return result
+
+
+def shard_argument(text):
+    '''
+    Reads the value of the --shard option, so that argparse can
+    report a bad value as a usage error instead of a traceback.
+
+    Parameters:
+
+        text: The value given on the command line, as INDEX/COUNT.
+
+    Result: A 2-tuple of the shard index and the number of shards.
+    Raises argparse.ArgumentTypeError if the text is not two whole
+    numbers with the index between 1 and the number of shards.
+
+    Example:
+    text = '2/4'
+
+    >>>(2, 4)
+    '''
+    try:
+        shard_index, num_shards = [int(each) for each in text.split('/')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            'expected INDEX/COUNT, such as 2/4, not %r' % text)
+    if not 1 <= shard_index <= num_shards:
+        raise argparse.ArgumentTypeError(
+            'shard index %d is not between 1 and %d' %
+            (shard_index, num_shards))
+    return shard_index, num_shards
+
+
+def concurrency_argument(text):
+    '''
+    Reads the value of the --concurrency option, so that argparse can
+    report a bad value as a usage error, instead of linting nothing
+    when no files are read at the same time.
+
+    Parameters:
+
+        text: The value given on the command line.
+
+    Result: The number of files to lint at the same time. Raises
+    argparse.ArgumentTypeError if the text is not a whole number of
+    at least 1.
+
+    Example:
+    text = '32'
+
+    >>>32
+    '''
+    try:
+        concurrency = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            'expected a whole number, not %r' % text)
+    if concurrency < 1:
+        raise argparse.ArgumentTypeError(
+            'concurrency must be at least 1, not %d' % concurrency)
+    return concurrency
+
+
+def main(args):
+    '''
+    Runs the linter from the command line, for example:
+
+        python lint.py naughty.py nice.py
+        python lint.py --gate --min-score 8 --block LONG_LINE naughty.py
+        python lint.py --sample 0.1 --seed 1 vendor/*.py
+        python lint.py --shard 2/4 --shard-prefix out/repo src/*.py
+        python lint.py --merge out/repo
+        python lint.py --format jsonl --format sarif --gzip naughty.py
+        python lint.py --concurrency 32 src/*.py
+        python lint.py --errors lint.errors.csv --max-memory 500000000 *.py
+        python lint.py --archive-out out dist/*.whl dist/*.tar.gz
+
+    Only one of --gate, --sample, --shard, --merge, --concurrency,
+    --errors and --archive-out can be given at a time.
+    Without --gate, lint is called for every file. With --gate,
+    gate is called for every file until one of them fails. With
+    --sample, the scores of all the files together are estimated
+    with estimate_scores from sample.py and written to the screen
+    as csv rows. With --format, the instances found by lint are
+    written in each of the formats given, as well as the csv file,
+    and with --gzip they are compressed. --format and --gzip also
+    work with --concurrency, --errors and --archive-out, and cannot
+    be used with --gate, --sample, --shard or --merge, which do not
+    write the instances of each file. With --shard, only the
+    files of one shard are linted with lint_shard from shard.py, and
+    --merge combines the results of all the shards with merge_shards.
+    With --concurrency, the files are linted with lint_many from
+    pipeline.py, and the files that could not be linted are written
+    to the screen.
+    With --errors, the files are linted within limits on their size,
+    line length, time and memory with lint_batch from guard.py, and
+    every file that went over a limit is written to the errors file.
+    With --archive-out, the files given are zip or tar archives, and
+    the python files in them are linted with lint_archive from
+    archive.py, writing the scores to the screen as csv rows.
+
+    Parameters:
+
+        args: The command line arguments, without the program name.
+
+    Result: The exit code, GATE_FAIL if any file failed the gate or
+    could not be linted with --concurrency, otherwise GATE_PASS.
+    '''
+    parser = argparse.ArgumentParser(
+        description='Find instances of bad programming style.')
+    parser.add_argument('python_filenames', nargs='*', metavar='FILE')
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument('--gate', action='store_true',
+                       help='only decide whether each file passes')
+    parser.add_argument('--min-score', type=float,
+                        help='the lowest passing quality score')
+    parser.add_argument('--block', action='append', default=[],
+                        choices=sorted(PENALTY_WEIGHTS), metavar='TYPE',
+                        help='an error type that fails the gate')
+    parser.add_argument('--max-findings', type=int,
+                        help='the number of instances that fails the gate')
+    parser.add_argument('--write-csv', action='store_true',
+                        help='also write the csv files in gate mode')
+    modes.add_argument('--sample', type=float, metavar='FRACTION',
+                       help='estimate the scores from this fraction of '
+                            'the files')
+    parser.add_argument('--block-fraction', type=float, default=0.2,
+                        help='the fraction of each sampled file to lint')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='the seed of the random sample')
+    modes.add_argument('--shard', type=shard_argument,
+                       metavar='INDEX/COUNT',
+                       help='only lint shard INDEX of COUNT shards')
+    parser.add_argument('--shard-prefix', default='lint',
+                        help='the start of the names of the shard csv files')
+    modes.add_argument('--merge', metavar='PREFIX',
+                       help='merge the shard csv files written with PREFIX')
+    parser.add_argument('--format', action='append', dest='formats',
+                        choices=sorted(SINKS),
+                        help='a format to write the instances in')
+    parser.add_argument('--gzip', action='store_true',
+                        help='compress the instances written with --format')
+    modes.add_argument('--concurrency', type=concurrency_argument,
+                       metavar='N',
+                       help='lint N files at the same time')
+    modes.add_argument('--archive-out', metavar='DIRECTORY',
+                       help='lint the python files inside archives and '
+                            'write the results to DIRECTORY')
+    modes.add_argument('--errors', metavar='FILE',
+                       help='lint within limits and write the files that '
+                            'went over them to FILE')
+    parser.add_argument('--max-bytes', type=int,
+                        help='the largest file to lint, in bytes')
+    parser.add_argument('--max-line-bytes', type=int,
+                        help='the longest line to tokenize, in bytes')
+    parser.add_argument('--max-seconds', type=float,
+                        help='the longest time to spend on a file')
+    parser.add_argument('--max-memory', type=int,
+                        help='the memory limit of the process linting '
+                             'each file, in bytes')
+    options = parser.parse_args(args)
+
+    # Only some modes write the instances of each file, and so can write
+    # them in other formats.
+    for (option, flag) in ((options.gate, '--gate'),
+                           (options.sample is not None, '--sample'),
+                           (options.shard is not None, '--shard'),
+                           (options.merge is not None, '--merge')):
+        if option and (options.formats or options.gzip):
+            parser.error('--format and --gzip cannot be used with %s' % flag)
+    if options.gzip and not options.formats:
+        parser.error('--gzip needs at least one --format')
+
+    if options.merge is not None:
+        from shard import merge_shards
+        print(','.join(str(each) for each in merge_shards(options.merge)))
+        return GATE_PASS
+    if not options.python_filenames:
+        parser.error('no files to lint')
+
+    if options.shard is not None:
+        from shard import lint_shard
+        shard_index, num_shards = options.shard
+        lint_shard(options.python_filenames, num_shards, shard_index,
+                   options.shard_prefix)
+        return GATE_PASS
+
+    if options.sample is not None:
+        from sample import estimate_scores
+        estimate = estimate_scores(options.python_filenames, options.sample,
+                                   options.block_fraction, options.seed)
+        writer = csv.writer(sys.stdout)
+        writer.writerow(["ESTIMATE", "VALUE", "LOW", "HIGH"])
+        for each_key in sorted(estimate["COUNTS"]):
+            writer.writerow([each_key] + ["%.0f" % each for each in
+                                          estimate["COUNTS"][each_key]])
+            writer.writerow([each_key + "_RATE"] +
+                            ["%.6f" % each for each in
+                             estimate["RATES"][each_key]])
+        writer.writerow(["QUALITY_SCORE"] + list(estimate["SCORE"]))
+        return GATE_PASS
+
+    if options.archive_out is not None:
+        from archive import lint_archive
+        writer = csv.writer(sys.stdout)
+        writer.writerow(["FILENAME", "LINES", "PENALTY", "QUALITY_SCORE"])
+        for archive_filename in options.python_filenames:
+            scores, errors = lint_archive(archive_filename,
+                                          options.archive_out,
+                                          options.formats, options.gzip)
+            for each_row in scores:
+                writer.writerow(each_row)
+            for (name, error) in errors:
+                sys.stderr.write('%s: %s\n' % (name, error))
+        return GATE_PASS
+
+    if options.errors is not None:
+        from guard import lint_batch, MAX_FILE_BYTES, MAX_LINE_BYTES, \
+            MAX_SECONDS
+        # A limit of 0 is kept as it is, rather than taken as not given.
+        if options.max_bytes is None:
+            options.max_bytes = MAX_FILE_BYTES
+        if options.max_line_bytes is None:
+            options.max_line_bytes = MAX_LINE_BYTES
+        if options.max_seconds is None:
+            options.max_seconds = MAX_SECONDS
+        lint_batch(options.python_filenames, options.errors,
+                   options.max_bytes, options.max_line_bytes,
+                   options.max_seconds, options.max_memory,
+                   options.formats, options.gzip)
+        return GATE_PASS
+
+    if options.concurrency is not None:
+        from pipeline import lint_many
+        failures = lint_many(options.python_filenames, options.concurrency,
+                             formats=options.formats,
+                             compress=options.gzip)
+        for python_filename in sorted(failures):
+            print('%s: %s' % (python_filename, failures[python_filename]))
+        return GATE_FAIL if failures else GATE_PASS
+
+    for python_filename in options.python_filenames:
+        if not options.gate:
+            lint(python_filename, options.formats, options.gzip)
+        elif gate(python_filename, options.min_score, options.block,
+                  options.max_findings, options.write_csv) == GATE_FAIL:
+            print(python_filename + ': failed')
+            return GATE_FAIL
+    return GATE_PASS
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
     
\ No newline at end of file
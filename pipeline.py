@@ -0,0 +1,226 @@
+'''
+Pipeline.
+
+This program lints many python files at once, for collections of
+thousands of small files kept on slow or network-mounted storage,
+where lint from lint.py spends most of its time waiting for files
+to be read and written rather than checking them.
+
+The files go through three stages that overlap with each other:
+
+    1.    Reading. Up to a fixed number of files are read at the same
+          time, each in a thread of an I/O thread pool.
+
+    2.    Checking. The contents of every file that has been read are
+          checked with find_all_instances from lint.py in a CPU
+          executor, a process pool by default, so that the checks do
+          not hold up the reading.
+
+    3.    Writing. The results are put in a queue of bounded size, and
+          a single writer takes them out in batches and writes the
+          output files of a whole batch in one go. When the writer
+          falls behind, the queue fills up and the reading stops until
+          there is room again, so the number of files held in memory
+          at once stays bounded however many files there are.
+
+Every file gets the same output files that lint gives it, the
+.lint.csv file, the .lines.idx file and a new row in the .score.csv
+log, and the instances in any other formats asked for.
+'''
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from lint import find_all_instances, calculate_total_penalty, \
+    calculate_quality_score, write_lint_csv, write_line_index, \
+    append_quality_score
+from sinks import write_instances
+from utils import split_source
+
+# The number of files read at the same time.
+CONCURRENCY = 16
+
+# The largest number of results written in one batch, which is also
+# the number of results that can wait in the queue for the writer.
+BATCH_SIZE = 64
+
+
+def read_bytes(python_filename):
+    '''
+    Returns the contents of a file as bytes.
+    '''
+    with open(python_filename, 'rb') as python_file:
+        return python_file.read()
+
+
+def analyse_source(python_filename, source):
+    '''
+    Finds every instance of bad programming style in the contents of
+    a python file that has already been read, and its quality score.
+
+    This is the CPU stage of the pipeline. It does not read or write
+    any files, so it can be run in another process.
+
+    Parameters:
+
+        python_filename: The python file the contents were read from.
+        source: The contents of the python file, as bytes.
+
+    Result: A tuple of the list of all the instances, sorted by line
+    number, the encoding of the file and its quality score.
+
+    Example:
+    python_filename = 'naughty.py'
+
+    >>>([[TRAIL_WHITESPACE,4,46,, ...], ...], 'utf-8', '7.78')
+    '''
+    encoding, lines = split_source(source)
+    list_total = find_all_instances(python_filename, source, encoding,
+                                    lines)
+    quality_score = calculate_quality_score(
+        calculate_total_penalty(list_total), len(lines))
+    return list_total, encoding, quality_score
+
+
+def write_batch(batch, formats=None, compress=False):
+    '''
+    Writes the output files of a batch of checked python files, the
+    same files that lint from lint.py writes.
+
+    Parameters:
+
+        batch: A list of (python_filename, source, list_total, encoding,
+               quality_score) tuples.
+        formats: The names of the formats to write the instances in as
+                 well as the csv file, from SINKS in sinks.py, or None
+                 for just the csv file.
+        compress: Whether to compress the instances with gzip, when
+                  formats are given.
+
+    Result: A dictionary from the name of every python file whose
+    output files could not be written to the error.
+    '''
+    failures = {}
+    for (python_filename, source, list_total, encoding,
+         quality_score) in batch:
+        try:
+            if formats is None:
+                write_lint_csv(python_filename, list_total)
+            else:
+                write_instances(python_filename[:-2], python_filename,
+                                list_total, formats, compress)
+            write_line_index(python_filename, source, encoding)
+            append_quality_score(python_filename, quality_score)
+        except Exception as error:
+            failures[python_filename] = error
+    return failures
+
+
+async def lint_many_async(python_filenames, concurrency=CONCURRENCY,
+                          cpu_executor=None, batch_size=BATCH_SIZE,
+                          formats=None, compress=False):
+    '''
+    Lints many python files, overlapping the reading, checking and
+    writing of different files, as described at the top of this
+    program. This is the asynchronous version of lint_many, for
+    callers that already run an event loop.
+
+    Parameters: The same as for lint_many, except that cpu_executor
+    must be given.
+
+    Result: The same as for lint_many.
+    '''
+    if concurrency < 1:
+        raise ValueError('concurrency must be at least 1, not %d' %
+                         concurrency)
+    loop = asyncio.get_running_loop()
+    io_executor = ThreadPoolExecutor(concurrency + 1)
+    names = asyncio.Queue()
+    for python_filename in python_filenames:
+        names.put_nowait(python_filename)
+    results = asyncio.Queue(maxsize=batch_size)
+    failures = {}
+
+    async def check_files():
+        # Reads and checks files until there are none left, waiting
+        # whenever the queue of results is full.
+        while not names.empty():
+            python_filename = names.get_nowait()
+            try:
+                source = await loop.run_in_executor(
+                    io_executor, read_bytes, python_filename)
+                analysis = await loop.run_in_executor(
+                    cpu_executor, analyse_source, python_filename, source)
+            except Exception as error:
+                failures[python_filename] = error
+                continue
+            await results.put((python_filename, source) + analysis)
+
+    async def write_files():
+        # Writes whatever results are waiting, in batches, until the
+        # None put in the queue after the last result.
+        finished = False
+        while not finished:
+            batch = [await results.get()]
+            while len(batch) < batch_size and not results.empty():
+                batch.append(results.get_nowait())
+            if batch[-1] is None:
+                batch.pop()
+                finished = True
+            failures.update(await loop.run_in_executor(
+                io_executor, write_batch, batch, formats, compress))
+
+    writer = asyncio.ensure_future(write_files())
+    try:
+        await asyncio.gather(*[check_files() for _ in range(concurrency)])
+        await results.put(None)
+        await writer
+    finally:
+        writer.cancel()
+        io_executor.shutdown()
+    return failures
+
+
+def lint_many(python_filenames, concurrency=CONCURRENCY, cpu_executor=None,
+              batch_size=BATCH_SIZE, formats=None, compress=False):
+    '''
+    Lints many python files, giving each the same output files as
+    lint from lint.py, but overlapping the reading, checking and
+    writing of different files.
+
+    A file that cannot be read, checked or written does not stop
+    the other files from being linted. Its error is returned instead.
+
+    Parameters:
+
+        python_filenames: The python files to lint.
+        concurrency: The number of files read and checked at the
+                     same time. Raises ValueError if it is less than 1.
+        cpu_executor: The concurrent.futures executor the checks are
+                      run in. A process pool with the default number
+                      of processes is used if it is None.
+        batch_size: The largest number of files whose output files are
+                    written in one go, and the number of checked files
+                    that can wait to be written.
+        formats: The names of the formats to write the instances in as
+                 well as the csv file, from SINKS in sinks.py, or None
+                 for just the csv file.
+        compress: Whether to compress the instances with gzip, when
+                  formats are given.
+
+    Result: A dictionary from the name of every python file that could
+    not be linted to the error.
+
+    Example:
+    python_filenames = ['naughty.py', 'nice.py', 'missing.py']
+
+    >>>{'missing.py': FileNotFoundError(2, 'No such file or directory')}
+
+    Creates naughty.lint.csv, nice.lint.csv and so on, as lint does.
+    '''
+    if cpu_executor is not None:
+        return asyncio.run(lint_many_async(python_filenames, concurrency,
+                                           cpu_executor, batch_size,
+                                           formats, compress))
+    with ProcessPoolExecutor() as cpu_executor:
+        return asyncio.run(lint_many_async(python_filenames, concurrency,
+                                           cpu_executor, batch_size,
+                                           formats, compress))
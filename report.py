@@ -22,30 +22,145 @@ Revision History:
 
 '''
 import csv
-from utils import plot_graph
+import hashlib
+import html
+import mmap
+import os
+import sys
+from array import array
+from utils import plot_graph, downsample_lttb
 
+# The most scores that are plotted in a quality score graph.
+MAX_GRAPH_POINTS = 20
 
-def create_quality_score_graph(python_filename):
+# The number of rows at the end of the score log that are part of the
+# fingerprint of a report.
+FINGERPRINT_ROWS = 20
+
+
+def read_score_history(python_filename, start_time=None, end_time=None):
+    '''
+    Reads the (python_filename).score.csv log written by the
+    write_quality_score_log function in lint.py and returns the
+    rows that fall within a time window.
+
+    Each row of the log holds the date and time of a lint run
+    and the quality score of that run. The date and time strings
+    are written by get_current_date_time in the format
+    <year>-<month>-<day> <hour>:<min>:<sec>, so they sort in the
+    same order as the times they represent, and the window can be
+    tested by comparing the strings directly.
+
+    Parameters:
+
+        python_filename: The name of the python file you want the
+                         score history of.
+        start_time: The earliest date and time to include, as a
+                    string. None means from the start of the log.
+        end_time: The latest date and time to include, as a string.
+                  None means up to the end of the log.
+
+    Result: A list of [date and time, score] lists, oldest first.
+
+    Example:
+
+    python_filename = 'naughty.py'
+    start_time = '2014-10-17 00:00:00'
+    >>>[['2014-10-17 09:15:43', '4.12'], ['2014-10-18 10:02:11', '5.30']]
+    '''
+    with open(python_filename[:-2] + 'score.csv') as contents:
+        reader = csv.reader(contents)
+        list_of_scores = [each_line for each_line in reader if each_line]
+
+    return [each_line for each_line in list_of_scores
+            if (start_time is None or each_line[0] >= start_time) and
+            (end_time is None or each_line[0] <= end_time)]
+
+
+def downsample_score_history(python_filename, start_time=None,
+                             end_time=None, max_points=MAX_GRAPH_POINTS):
+    '''
+    Returns the score history of a python file within a time window,
+    downsampled to at most max_points rows with downsample_lttb from
+    utils.py, so the trend of thousands of lint runs can be plotted
+    without drawing every run.
+
+    The downsampled rows are cached in the
+    (python_filename).history.cache.csv file. The first row of the
+    cache records the size and modification time of the .score.csv
+    file and the window and max_points the cache was built for. The
+    score log is only ever appended to, so if all of these match,
+    the cached rows are returned without reading the score log again.
+    Otherwise the history is downsampled and the cache rewritten.
+
+    Parameters:
+
+        python_filename: The name of the python file you want the
+                         score history of.
+        start_time: The earliest date and time to include, as a
+                    string. None means from the start of the log.
+        end_time: The latest date and time to include, as a string.
+                  None means up to the end of the log.
+        max_points: The maximum number of rows to return.
+
+    Result: A list of at most max_points [date and time, score] lists,
+    oldest first. The first and last rows of the window are always kept.
+
+    Example:
+
+    python_filename = 'naughty.py'
+    max_points = 3
+    >>>[['2014-10-16 09:15:43', '4.12'], ['2014-10-17 11:20:05', '1.03'],
+        ['2014-10-23 10:02:11', '8.30']]
+    '''
+    score_filename = python_filename[:-2] + 'score.csv'
+    cache_filename = python_filename[:-2] + 'history.cache.csv'
+    score_stat = os.stat(score_filename)
+    cache_key = [str(score_stat.st_size), str(score_stat.st_mtime),
+                 start_time or '', end_time or '', str(max_points)]
+
+    # Uses the cached rows if they were built from the same score log
+    # and for the same window.
+    if os.path.exists(cache_filename):
+        with open(cache_filename) as contents:
+            cached = list(csv.reader(contents))
+        if cached and cached[0] == cache_key:
+            return cached[1:]
+
+    history = read_score_history(python_filename, start_time, end_time)
+    scores = [float(each_line[1]) for each_line in history]
+    history = [history[index]
+               for index in downsample_lttb(scores, max_points)]
+
+    with open(cache_filename, 'w') as cache_file:
+        writer = csv.writer(cache_file)
+        writer.writerow(cache_key)
+        for each_line in history:
+            writer.writerow(each_line)
+
+    return history
+
+
+def create_quality_score_graph(python_filename, start_time=None,
+                               end_time=None, max_points=MAX_GRAPH_POINTS):
     '''
     Creates a quality score graph from the information
     in the (python_filename).score.csv file,
     created by the lint function in lint.py.
     
-    The (python_filename).score.csv file is first
-    opened and the contents stored in the variable
-    list_of_scores.
+    The scores within the time window from start_time to
+    end_time are found with the downsample_score_history
+    function. Every score in the window is taken into account,
+    but at most max_points of them are plotted, chosen so that
+    the shape of the score history is kept. This means the whole
+    history can be shown without the graph becoming slow to
+    render or unreadable.
     
     Two empty lists are created to put each element of the
     list of scores. x_axis_ticks will contain the date and
     time values in the csv file, while the each_score
     variable will contain each score from the file.
     
-    The for loop is the element that moves this data into
-    the respective lists. We only want the last 20 results
-    to be put into the graph, so we limit the for loop to
-    only go through the last 20 items from the list.
-    Hence why we stipulate list_of_scores[-20:].
-    
     We next call the function plot_graph from the utils.py
     program.
     
@@ -68,6 +183,11 @@ def create_quality_score_graph(python_filename):
     
     python_filename: The name of the python file you want to create
     a quality score graph for.
+    start_time: The earliest date and time to plot, as a string.
+    None means from the start of the score history.
+    end_time: The latest date and time to plot, as a string.
+    None means up to the most recent score.
+    max_points: The maximum number of scores to plot.
     
     Example:
     
@@ -77,20 +197,17 @@ def create_quality_score_graph(python_filename):
     creates a svg file called naughty.history.svg
     
     '''
-    # Reads the contents of the .score.csv file and puts it into
-    # a list
-    with open(python_filename[:-2] + 'score.csv', 'rb') as contents:
-        reader = csv.reader(contents)
-        list_of_scores = list(reader)
+    list_of_scores = downsample_score_history(python_filename, start_time,
+                                              end_time, max_points)
     
     x_axis_ticks = []
     each_score = []
     
-    # Takes the last 20 scores and appends the contents into
+    # Appends the contents of the downsampled scores into
     # the two empty lists x_axis_ticks and each_score
-    for each_line in list_of_scores[-20:]:
+    for each_line in list_of_scores:
         x_axis_ticks.append(each_line[0])
-        each_score.append(each_line[1])
+        each_score.append(float(each_line[1]))
 
     # Calls the plot_graph function from utils.py
     plot_graph(each_score, x_axis_ticks, 10, 'Date and Time',
@@ -98,7 +215,196 @@ def create_quality_score_graph(python_filename):
                python_filename, python_filename[:-2] + 'history.svg')
     
 
-def report(python_filename):
+def read_line_index(python_filename):
+    '''
+    Reads the (python_filename).lines.idx file written by the
+    write_line_index function in lint.py.
+
+    The index is only used if the size and the modification time
+    of the python file are still the ones recorded in the index.
+    Otherwise the python file has changed since it was linted,
+    even if an edit kept its size, and the offsets in the index
+    can no longer be trusted. There is no index that can be used
+    if the python file is not on disk either, as for the output
+    files of a member of an archive linted by archive.py.
+
+    Parameters:
+
+        python_filename: The name of the python file you want the
+                         line index of.
+
+    Result: A 2-tuple of the encoding of the python file and an
+    array of the offsets of the start of every line, or None if
+    there is no index that can be used.
+
+    Example:
+
+    python_filename = 'naughty.py'
+    >>>('utf-8', array('Q', [0, 17, 18, 66, ... 23011]))
+    '''
+    index_filename = python_filename[:-2] + 'lines.idx'
+    if not os.path.exists(index_filename):
+        return None
+    with open(index_filename, 'rb') as index_file:
+        header = index_file.readline().decode('ascii').split()
+        offsets = array('Q')
+        offsets.frombytes(index_file.read())
+    if sys.byteorder == 'big':
+        offsets.byteswap()
+    if len(header) != 3 or not offsets:
+        return None
+    try:
+        source_stat = os.stat(python_filename)
+    except OSError:
+        return None
+    if int(header[1]) != source_stat.st_size or \
+            int(header[2]) != source_stat.st_mtime_ns:
+        return None
+    return header[0], offsets
+
+
+def get_source_lines(source, encoding, offsets, first, last):
+    '''
+    Returns the lines first to last of a python file, using the
+    offsets from read_line_index to slice them straight out of
+    the contents of the file. Each line is found in constant
+    time, however many lines come before it.
+
+    Parameters:
+
+        source: The contents of the python file, usually an mmap
+                of it so that only the lines asked for are read.
+        encoding: The encoding of the python file.
+        offsets: The offsets of the start of every line.
+        first: The line number of the first line to return.
+        last: The line number of the last line to return.
+
+    Result: A list of (line number, line) tuples, with the line
+    endings removed. Line numbers outside the file are left out.
+
+    Example:
+
+    first = 193
+    last = 195
+    >>>[(193, '    \'\'\'Compute the gradient magnitude ... \'\'\''),
+        (194, '      r = gradient_row(image, row, col)'),
+        (195, '      c = gradient_col(image, row, col)')]
+    '''
+    first = max(first, 1)
+    last = min(last, len(offsets) - 1)
+    return [(line_number,
+             source[offsets[line_number - 1]:offsets[line_number]]
+             .decode(encoding, 'replace').rstrip('\r\n'))
+            for line_number in range(first, last + 1)]
+
+
+def context_html(source, encoding, offsets, line_number, context):
+    '''
+    Returns the html for the lines around an instance of bad
+    programming style, numbered and marking the line of the
+    instance with an arrow.
+
+    Parameters:
+
+        source: The contents of the python file, or an mmap of it.
+        encoding: The encoding of the python file.
+        offsets: The offsets of the start of every line.
+        line_number: The line number of the instance.
+        context: The number of lines to show before and after it.
+
+    Result: The html as a string, with the lines escaped so that
+    any <, > or & in them is shown rather than read as html.
+    '''
+    text = '<pre>'
+    for (each_number, each_line) in get_source_lines(
+            source, encoding, offsets, line_number - context,
+            line_number + context):
+        marker = '&rarr;' if each_number == line_number else ' '
+        text += '%s%5d  %s\n' % (marker, each_number,
+                                  html.escape(each_line))
+    return text + '</pre>'
+
+
+def read_last_rows(filename, num_rows):
+    '''
+    Returns the last num_rows rows of a file, reading backwards from
+    the end of the file so that only the end of a long log is read.
+
+    Parameters:
+
+        filename: The name of the file.
+        num_rows: The number of rows to return.
+
+    Result: The last num_rows rows, as bytes, including their line
+    endings. Fewer rows are returned if the file is shorter.
+
+    Example:
+
+    filename = 'naughty.score.csv'
+    num_rows = 2
+    >>>b'2014-10-22 16:45:10,5.30\r\n2014-10-23 10:02:11,8.30\r\n'
+    '''
+    with open(filename, 'rb') as contents:
+        end = contents.seek(0, os.SEEK_END)
+        start = end
+        tail = b''
+        # The last row ends with a newline, so num_rows + 1 newlines are
+        # needed to be sure that the whole of every row has been read.
+        while start > 0 and tail.count(b'\n') <= num_rows:
+            start = max(0, start - 4096)
+            contents.seek(start)
+            tail = contents.read(end - start)
+    rows = tail.splitlines(True)
+    return b''.join(rows[-num_rows:])
+
+
+def report_fingerprint(python_filename, context=0):
+    '''
+    Returns a fingerprint of everything a report of a python file is
+    made from: the whole of the .lint.csv file, the size and the last
+    FINGERPRINT_ROWS rows of the .score.csv file, the options of the
+    quality score graph and the number of context lines. When context
+    lines are shown, the size and modification time of the python file
+    are part of the fingerprint too, since the lines are read from it,
+    unless the python file is not on disk, in which case no lines are
+    shown.
+
+    The score log is only ever appended to, so its size changes with
+    every lint run, and the last rows catch a log that was rewritten
+    with the same size.
+
+    Parameters:
+
+        python_filename: The name of the python file the report is for.
+        context: The number of lines shown before and after each
+                 instance.
+
+    Result: The fingerprint, as a string of hexadecimal digits.
+
+    Example:
+
+    python_filename = 'naughty.py'
+    >>>'5d0b6c1e4f...'
+    '''
+    digest = hashlib.sha256()
+    with open(python_filename[:-2] + 'lint.csv', 'rb') as contents:
+        for chunk in iter(lambda: contents.read(1 << 16), b''):
+            digest.update(chunk)
+    score_filename = python_filename[:-2] + 'score.csv'
+    options = [os.path.getsize(score_filename), MAX_GRAPH_POINTS, context]
+    if context > 0:
+        try:
+            source_stat = os.stat(python_filename)
+            options += [source_stat.st_size, source_stat.st_mtime_ns]
+        except OSError:
+            pass
+    digest.update((' '.join(str(each) for each in options) + '\n')
+                  .encode('ascii'))
+    digest.update(read_last_rows(score_filename, FINGERPRINT_ROWS))
+    return digest.hexdigest()
+
+
+def report(python_filename, context=0, force=False):
     '''
     Reads the output from the lint function in lint.py,
     namely the .lint.csv and .score.csv files, and creates
@@ -113,13 +419,31 @@ def report(python_filename):
     Each individual instance is written to
     the html file differently.
     
+    If context is more than 0, that many lines before and after
+    each instance are shown too. They are read from a memory map
+    of the python file, using the line index written by lint,
+    so showing them does not depend on the size of the file.
+    If the file has changed since it was linted, no context is
+    shown.
+    
+    The fingerprint of the report, from report_fingerprint, is
+    kept in the .report.fingerprint file. If nothing the report
+    is made from has changed since it was last created, and the
+    html and svg files are still there, they are left untouched
+    instead of being created again.
+    
     Parameters:
     
         python_filename: The name of the python file you want to create
+        context: The number of lines to show before and after
+                 each instance.
+        force: If True, the report is created even if it has not
+               changed.
     
     Result:
     
-    A html file and a svg file. The html file contains a report
+    True if the report was created, or False if it was up to date.
+    Also a html file and a svg file. The html file contains a report
     of the instances of bad programming style in an input
     python file. The svg file contains a graph of the scores
     contained in the .score.csv file over time.
@@ -127,22 +451,44 @@ def report(python_filename):
     Example:
     
     python_filename = 'naughty.py'
-    >>>None
+    >>>True
     
     Creates a html file naughty.report.html
     Creates a svg file called naughty.history.svg
     
     '''
-    # Creates the file .report.html file in write mode
+    # Leaves the report alone if nothing it is made from has changed.
     out_filename = python_filename[:-2] + 'report.html'
+    fingerprint_filename = python_filename[:-2] + 'report.fingerprint'
+    fingerprint = report_fingerprint(python_filename, context)
+    if os.path.exists(fingerprint_filename):
+        with open(fingerprint_filename) as contents:
+            if not force and contents.read().strip() == fingerprint and \
+                    os.path.exists(out_filename) and \
+                    os.path.exists(python_filename[:-2] + 'history.svg'):
+                return False
+        os.remove(fingerprint_filename)
+
+    # Creates the file .report.html file in write mode
     out_file = open(out_filename, 'w')
     
     # Opens the .lint.csv file and reads the lines into
     # the variable lines
-    with open(python_filename[:-2] + 'lint.csv', 'rb') as contents:
+    with open(python_filename[:-2] + 'lint.csv') as contents:
         reader = csv.reader(contents)
         list_of_instances = list(reader)
     
+    # Opens a memory map of the python file, if the lines around
+    # each instance are to be shown.
+    line_index = None
+    if context > 0:
+        line_index = read_line_index(python_filename)
+    if line_index and line_index[1][-1] > 0:
+        source_file = open(python_filename, 'rb')
+        source = mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ)
+    else:
+        line_index = None
+    
     out_file.write('\n')
     out_file.write('<!DOCTYPE html>\n')
     out_file.write('<html>\n')
@@ -156,25 +502,36 @@ def report(python_filename):
     out_file.write('            <ol>\n')
     
     for line in list_of_instances[1:]:
+        extra = ''
+        if line_index:
+            extra = context_html(source, line_index[0], line_index[1],
+                                 int(line[1]), context)
         if line[0] == "SINGLE_CHAR_VAR":
             out_file.write('                <li>Line: ' + line[1] + ', Col: ' +
                            line[2] + '. Single character variable ' +
                            line[3] + '.<br><pre>&longrightarrow;' +
-                           line[4] + '&longleftarrow;</pre></li>\n')
+                           line[4] + '&longleftarrow;</pre>' + extra +
+                           '</li>\n')
         elif line[0] == "LONG_LINE":
             out_file.write('                <li>Line: ' + line[1] +
                            '. Line too long, length = ' + line[3] +
                            '.<br><pre>&longrightarrow;' + line[4] +
-                           '&longleftarrow;</pre></li>\n')
+                           '&longleftarrow;</pre>' + extra + '</li>\n')
         elif line[0] == "TRAIL_WHITESPACE":
             out_file.write('                <li>Line: ' + line[1] +
                            ', Col: ' + line[2] +
                            '. Trailing whitespace.<br><pre>&longrightarrow;' +
-                           line[4] + '&longleftarrow;</pre></li>\n')
+                           line[4] + '&longleftarrow;</pre>' + extra +
+                           '</li>\n')
         elif line[0] == "BAD_INDENT":
             out_file.write('                <li>Line: ' + line[1] + ', Col: ' +
                            line[2] + '. Bad indent.<br><pre>&longrightarrow;' +
-                           line[4] + '&longleftarrow;</pre></li>\n')
+                           line[4] + '&longleftarrow;</pre>' + extra +
+                           '</li>\n')
+
+    if line_index:
+        source.close()
+        source_file.close()
 
     out_file.write('            </ol>\n')
     out_file.write('        <h2>Score history</h2>\n')
@@ -189,3 +546,10 @@ def report(python_filename):
     out_file.write('    </body>\n')
     out_file.write('</html>\n')
     out_file.close()
+
+    # The fingerprint is only written once the report is complete, and
+    # the old one was removed above, so a report that failed part way
+    # through is created again next time.
+    with open(fingerprint_filename, 'w') as fingerprint_file:
+        fingerprint_file.write(fingerprint + '\n')
+    return True
@@ -0,0 +1,339 @@
+'''
+Sample.
+
+This program estimates the quality score and the number of
+instances of each bad programming style over a large collection
+of python files, by linting only a random sample of it instead
+of every line.
+
+The sample is drawn in two stages:
+
+    1.    The files are sorted by size and split into strata of
+          similar sized files. A fixed fraction of the files in
+          every stratum is picked at random. The few files that are
+          much larger than the rest are always picked.
+
+    2.    Every picked file is split into blocks of lines, and a
+          fixed fraction of its blocks, and at least two, is picked
+          at random and linted with generate_instances from lint.py.
+
+The counts in the linted blocks are scaled up to estimates for
+the whole collection, and each estimate is given with a confidence
+interval. Using the same seed always gives the same sample, and so
+the same estimates.
+'''
+import math
+import os
+import random
+from statistics import NormalDist
+from tokenize import TokenError
+from lint import PENALTY_WEIGHTS, calculate_quality_score, generate_instances
+from utils import read_source
+from viewport import logical_line_starts
+
+# The number of lines in a block, before the block is stretched to end
+# just before a top-level statement.
+BLOCK_SIZE = 50
+
+
+def split_blocks(lines, block_size=BLOCK_SIZE):
+    '''
+    Splits the lines of a python file into blocks of about block_size
+    lines each, and returns where each block starts and ends.
+
+    Every block after the first starts on the first line of a
+    top-level statement, as found by logical_line_starts from
+    viewport.py, which knows which lines are inside strings and
+    brackets. The tokenizer can then read each block on its own,
+    without the lines before it, and find exactly the variables and
+    indents that it finds on those lines in the whole file. After a
+    quote that logical_line_starts cannot scan past, the rest of the
+    file is a single block.
+
+    Parameters:
+
+        lines: The lines of the program, as bytes.
+        block_size: The number of lines to aim for in each block.
+
+    Result: A list of (start, end) tuples, such that lines[start:end]
+    is a block. The blocks cover every line exactly once.
+
+    Example:
+    lines = [b'def f():\n', b'    return 1\n', b'x = f()\n']
+    block_size = 1
+
+    >>>[(0, 2), (2, 3)]
+    '''
+    blocks = []
+    start = 0
+    for (line_number, indents) in logical_line_starts(lines):
+        if indents is None or indents is False:
+            break
+        # A statement that is not indented is a top-level statement,
+        # whatever indents were open before it.
+        if lines[line_number - 1][:1] in b' \t\f':
+            continue
+        if line_number - 1 >= start + block_size:
+            blocks.append((start, line_number - 1))
+            start = line_number - 1
+    if start < len(lines):
+        blocks.append((start, len(lines)))
+    return blocks
+
+
+def lint_block(python_filename, lines, encoding):
+    '''
+    Counts the instances of each bad programming style in a block
+    of lines and the penalty they add up to.
+
+    Parameters:
+
+        python_filename: The python file the block comes from.
+        lines: The lines of the block, as bytes.
+        encoding: The encoding of the lines.
+
+    Result: A dictionary with a count for every error type in
+    PENALTY_WEIGHTS and a count for the key "PENALTY".
+    '''
+    counts = dict.fromkeys(PENALTY_WEIGHTS, 0)
+    counts["PENALTY"] = 0
+    instances = generate_instances(python_filename, lines, encoding)
+    try:
+        for instance in instances:
+            counts[instance[0]] += 1
+            counts["PENALTY"] += PENALTY_WEIGHTS[instance[0]]
+    except (TokenError, SyntaxError, UnicodeDecodeError):
+        # A block can end in the middle of a statement, which makes the
+        # tokenizer give up. The instances found up to that point are
+        # still counted.
+        pass
+    return counts
+
+
+def estimate_file(python_filename, fraction, rng, block_size=BLOCK_SIZE):
+    '''
+    Lints a random fraction of the blocks of one python file, and
+    estimates the counts for the whole file by scaling up the counts
+    of the linted blocks.
+
+    Parameters:
+
+        python_filename: The python file to estimate the counts of.
+        fraction: The fraction of blocks to lint, between 0 and 1.
+                  At least two blocks are always linted, if the file
+                  has two or more, so that the variance between the
+                  blocks of the file can be estimated.
+        rng: The random.Random used to pick the blocks.
+        block_size: The number of lines to aim for in each block.
+
+    Result: A dictionary with an estimated count for every error type
+    in PENALTY_WEIGHTS and for the key "PENALTY", the exact number of
+    lines in the file under the key "LINES", the number of blocks in
+    the file under the key "NUM_BLOCKS", and the counts of each linted
+    block under the key "BLOCKS". The lines of the file are counted
+    exactly, not estimated from the blocks, so "LINES" is 0 in the
+    counts of the blocks.
+    '''
+    _source, encoding, lines = read_source(python_filename)
+
+    blocks = split_blocks(lines, block_size)
+    num_picked = min(len(blocks), max(2, int(math.ceil(fraction *
+                                                        len(blocks)))))
+    estimate = dict.fromkeys(PENALTY_WEIGHTS, 0.0)
+    estimate["PENALTY"] = 0.0
+    estimate["BLOCKS"] = []
+    for (start, end) in rng.sample(blocks, num_picked):
+        counts = lint_block(python_filename, lines[start:end], encoding)
+        for each_key in counts:
+            estimate[each_key] += counts[each_key] * float(len(blocks)) \
+                / num_picked
+        counts["LINES"] = 0
+        estimate["BLOCKS"].append(counts)
+    estimate["LINES"] = len(lines)
+    estimate["NUM_BLOCKS"] = len(blocks)
+    return estimate
+
+
+def sample_variance(values):
+    '''
+    Returns the sample variance of a list of at least two numbers.
+    '''
+    mean = sum(values) / len(values)
+    return sum((each - mean) ** 2 for each in values) / (len(values) - 1)
+
+
+def make_strata(python_filenames, num_strata, file_fraction=1.0):
+    '''
+    Sorts the python files by size and splits them into at most
+    num_strata strata with the same number of files, give or take one.
+
+    A file larger than the average size of the files times
+    1 / file_fraction would, if it were picked, stand for more of the
+    collection than its fair share, and if it were not, leave a large
+    part of the collection unseen. Such files are kept out of the
+    strata, to be linted with certainty.
+
+    Parameters:
+
+        python_filenames: The python files to split.
+        num_strata: The number of strata to split the files into.
+        file_fraction: The fraction of the files in each stratum that
+                       will be picked.
+
+    Result: A 2-tuple of the list of the files to lint with certainty
+    and a list of lists of the other python filenames, smallest files
+    first.
+    '''
+    sizes = dict((name, os.path.getsize(name)) for name in python_filenames)
+    by_size = sorted(python_filenames, key=lambda name: (sizes[name], name))
+    cutoff = sum(sizes.values()) / max(1.0, file_fraction * len(by_size))
+    certain = [name for name in by_size if sizes[name] > cutoff]
+    by_size = by_size[:len(by_size) - len(certain)]
+    num_strata = min(num_strata, len(by_size))
+    return certain, [by_size[len(by_size) * index // num_strata:
+                             len(by_size) * (index + 1) // num_strata]
+                     for index in range(num_strata)]
+
+
+def estimate_scores(python_filenames, file_fraction=0.1,
+                    block_fraction=0.2, seed=0, num_strata=4,
+                    confidence=0.95, block_size=BLOCK_SIZE):
+    '''
+    Estimates the number of instances of each bad programming style
+    in a collection of python files, the rate of each per line, and
+    the quality score of the collection as if it were one big file,
+    each with a confidence interval.
+
+    The totals of every stratum are estimated from the files picked
+    in it, and added up. The files that make_strata keeps out of the
+    strata for being so large are all picked, as a stratum of their
+    own. The confidence intervals use the normal approximation, with
+    the variance of a two stage sample: the variance between the
+    picked files of each stratum, shrunk by the fraction of its files
+    that were not picked, plus the variance between the linted blocks
+    of each picked file, shrunk by the fraction of its blocks that
+    were not linted. When every block of every file is linted the
+    intervals have no width. The rates and the quality score are
+    ratios of two estimated totals, so their variance is approximated
+    by linearization.
+
+    The intervals are only approximate. For an error type found in
+    just a handful of the files, such as bad indents in a collection
+    that mostly uses 4 spaces, the picked files often miss most of
+    them, and the interval is then too narrow to hold the true count.
+
+    Parameters:
+
+        python_filenames: The python files to estimate the scores of.
+        file_fraction: The fraction of the files in each stratum to pick.
+                       At least two files are picked from every stratum
+                       that has two or more files.
+        block_fraction: The fraction of the blocks of each picked file
+                        to lint. At least two blocks are linted in every
+                        picked file that has two or more.
+        seed: The seed of the random choices. The same seed and files
+              always give the same result.
+        num_strata: The number of strata to split the files into.
+        confidence: The confidence level of the intervals.
+        block_size: The number of lines to aim for in each block.
+
+    Result: A dictionary with the keys:
+
+        "FILES": The number of files, and the number linted, as a tuple.
+        "LINES": The estimated number of lines.
+        "COUNTS": A dictionary from each error type to an
+                  (estimate, low, high) tuple of its number of instances.
+        "RATES": A dictionary from each error type to an
+                 (estimate, low, high) tuple of its instances per line.
+        "SCORE": An (estimate, low, high) tuple of the quality score.
+
+    Example:
+    python_filenames = ['vendor/a.py', 'vendor/b.py', ... ]
+    seed = 1
+
+    >>>{'FILES': (20000, 2000), 'LINES': 3120544.0,
+        'COUNTS': {'LONG_LINE': (10231.0, 9604.2, 10857.8), ... },
+        'RATES': {'LONG_LINE': (0.0033, 0.0031, 0.0035), ... },
+        'SCORE': ('8.41', '8.33', '8.49')}
+    '''
+    rng = random.Random(seed)
+    z_value = NormalDist().inv_cdf((1 + confidence) / 2.0)
+    keys = sorted(PENALTY_WEIGHTS) + ["PENALTY", "LINES"]
+
+    # The estimated totals of each key, and for every stratum the
+    # number of files in it and the estimates of its picked files.
+    totals = dict.fromkeys(keys, 0.0)
+    strata = []
+    num_picked = 0
+    certain, file_strata = make_strata(python_filenames, num_strata,
+                                       file_fraction)
+    for stratum in [certain] + file_strata:
+        if stratum is certain:
+            num_files = len(certain)
+        else:
+            num_files = min(len(stratum),
+                            max(2, int(math.ceil(file_fraction *
+                                                 len(stratum)))))
+        if num_files == 0:
+            continue
+        picked = [estimate_file(python_filename, block_fraction, rng,
+                                block_size)
+                  for python_filename in rng.sample(stratum, num_files)]
+        for each_key in keys:
+            totals[each_key] += len(stratum) * \
+                sum(each_file[each_key] for each_file in picked) / num_files
+        strata.append((len(stratum), picked))
+        num_picked += num_files
+
+    def variance(value):
+        # The variance of the estimated total of value(each_file) over
+        # all strata.
+        result = 0.0
+        for (num_files, picked) in strata:
+            if len(picked) >= 2:
+                result += num_files ** 2 * \
+                    (1 - len(picked) / float(num_files)) * \
+                    sample_variance([value(each_file)
+                                     for each_file in picked]) / len(picked)
+            for each_file in picked:
+                blocks = each_file["BLOCKS"]
+                if len(blocks) < 2:
+                    continue
+                result += float(num_files) / len(picked) * \
+                    each_file["NUM_BLOCKS"] ** 2 * \
+                    (1 - len(blocks) / float(each_file["NUM_BLOCKS"])) * \
+                    sample_variance([value(each_block)
+                                     for each_block in blocks]) / len(blocks)
+        return result
+
+    def interval(estimate, spread):
+        margin = z_value * math.sqrt(spread)
+        return (estimate, max(0.0, estimate - margin), estimate + margin)
+
+    num_lines = totals["LINES"]
+    counts = {}
+    rates = {}
+    for each_key in sorted(PENALTY_WEIGHTS):
+        counts[each_key] = interval(
+            totals[each_key], variance(lambda each_file: each_file[each_key]))
+        rate = totals[each_key] / num_lines if num_lines else 0.0
+        rates[each_key] = interval(rate, variance(
+            lambda each_file: each_file[each_key] -
+            rate * each_file["LINES"]) / (num_lines ** 2 or 1))
+
+    # The score falls as the penalty per line grows, so the high end of
+    # the penalty per line gives the low end of the score.
+    penalty_rate = totals["PENALTY"] / num_lines if num_lines else 0.0
+    penalty_interval = interval(penalty_rate, variance(
+        lambda each_file: each_file["PENALTY"] -
+        penalty_rate * each_file["LINES"]) / (num_lines ** 2 or 1))
+    score = tuple(calculate_quality_score(each * max(num_lines, 1),
+                                          max(num_lines, 1))
+                  for each in (penalty_interval[0], penalty_interval[2],
+                               penalty_interval[1]))
+
+    return {"FILES": (len(python_filenames), num_picked),
+            "LINES": num_lines,
+            "COUNTS": counts,
+            "RATES": rates,
+            "SCORE": score}
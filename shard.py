@@ -0,0 +1,235 @@
+'''
+Shard.
+
+This program splits the linting of many python files across
+several machines, such as the nodes of a CI job, and merges
+their results back together afterwards.
+
+Every node is given the same list of files and the same number
+of shards, and lints only the files of its own shard. The files
+are assigned to shards by size, largest first, each to the shard
+with the least bytes so far, so that every shard has about the
+same amount of work and the shards finish at about the same time.
+The assignment only depends on the names and sizes of the files,
+so every node works it out the same way without talking to the
+others.
+
+Each shard writes two csv files, named after a common prefix:
+
+    <prefix>.shard-<index>-of-<count>.lint.csv
+
+        Every instance of bad programming style in the shard, with
+        the name of the file it was found in.
+
+    <prefix>.shard-<index>-of-<count>.score.csv
+
+        The number of lines, the total penalty and the quality score
+        of every file in the shard.
+
+The merge_shards function combines the csv files of every shard
+into <prefix>.lint.csv and <prefix>.score.csv, the latter ending
+with a TOTAL row summarising all the files.
+'''
+import csv
+import glob
+import os
+import re
+from lint import find_all_instances, calculate_total_penalty, \
+    calculate_quality_score
+from utils import read_source
+
+
+def assign_shards(python_filenames, num_shards):
+    '''
+    Assigns python files to shards so that every shard has about
+    the same number of bytes to lint.
+
+    The files are taken largest first, with ties broken by name,
+    and each is put in the shard with the fewest bytes so far,
+    or the lowest numbered of those shards if there is a tie.
+
+    Parameters:
+
+        python_filenames: The python files to assign.
+        num_shards: The number of shards.
+
+    Result: A list of num_shards lists of python filenames, each
+    sorted by name. Shard index 1 is the first list.
+
+    Example:
+    python_filenames = ['a.py', 'b.py', 'c.py']  (sizes 10, 30, 25)
+    num_shards = 2
+
+    >>>[['b.py'], ['a.py', 'c.py']]
+    '''
+    by_size = sorted(set(python_filenames),
+                     key=lambda name: (-os.path.getsize(name), name))
+    shards = [[] for _ in range(num_shards)]
+    shard_sizes = [0] * num_shards
+    for python_filename in by_size:
+        smallest = shard_sizes.index(min(shard_sizes))
+        shards[smallest].append(python_filename)
+        shard_sizes[smallest] += os.path.getsize(python_filename)
+    return [sorted(shard) for shard in shards]
+
+
+def shard_filename(prefix, shard_index, num_shards):
+    '''
+    Returns the start of the names of the csv files of one shard,
+    <prefix>.shard-<index>-of-<count>.
+    '''
+    return '%s.shard-%d-of-%d.' % (prefix, shard_index, num_shards)
+
+
+def lint_shard(python_filenames, num_shards, shard_index, prefix):
+    '''
+    Lints the python files assigned to one shard by assign_shards
+    and writes the two csv files of the shard.
+
+    Parameters:
+
+        python_filenames: All the python files, in any order.
+        num_shards: The number of shards.
+        shard_index: The shard to lint, from 1 to num_shards.
+        prefix: The start of the names of the csv files.
+
+    Result: The number of files linted.
+
+    Example:
+    python_filenames = ['a.py', 'b.py', 'c.py']
+    num_shards = 2
+    shard_index = 2
+    prefix = 'out/repo'
+
+    >>>2
+
+    Creates out/repo.shard-2-of-2.lint.csv and
+    out/repo.shard-2-of-2.score.csv
+    '''
+    if not 1 <= shard_index <= num_shards:
+        raise ValueError('shard index %d is not between 1 and %d' %
+                         (shard_index, num_shards))
+    shard = assign_shards(python_filenames, num_shards)[shard_index - 1]
+    out_filename = shard_filename(prefix, shard_index, num_shards)
+
+    lint_file = open(out_filename + 'lint.csv', 'w')
+    lint_writer = csv.writer(lint_file)
+    lint_writer.writerow(["FILENAME", "ERROR_TYPE", "LINE_NUMBER",
+                          "COLUMN", "INFO", "SOURCE_LINE"])
+    score_file = open(out_filename + 'score.csv', 'w')
+    score_writer = csv.writer(score_file)
+    score_writer.writerow(["FILENAME", "LINES", "PENALTY", "QUALITY_SCORE"])
+
+    for python_filename in shard:
+        source, encoding, lines = read_source(python_filename)
+        list_total = find_all_instances(python_filename, source, encoding,
+                                        lines)
+        for each_item in list_total:
+            lint_writer.writerow([python_filename] + each_item)
+        total_penalty = calculate_total_penalty(list_total)
+        score_writer.writerow([python_filename, len(lines), total_penalty,
+                               calculate_quality_score(total_penalty,
+                                                       len(lines))])
+
+    lint_file.close()
+    score_file.close()
+    return len(shard)
+
+
+def find_shards(prefix):
+    '''
+    Finds the csv files of every shard written with a prefix, and
+    checks that there is exactly one of each shard.
+
+    Parameters:
+
+        prefix: The start of the names of the csv files.
+
+    Result: A list of the starts of the names of the csv files of
+    each shard, as returned by shard_filename, in shard order.
+    Raises ValueError if a shard is missing or if shards of
+    different counts were written with the same prefix.
+    '''
+    pattern = re.compile(re.escape(prefix) +
+                         r'\.shard-(\d+)-of-(\d+)\.score\.csv$')
+    found = set()
+    for each_name in glob.glob(glob.escape(prefix) + '.shard-*.score.csv'):
+        match = pattern.match(each_name)
+        if match:
+            found.add((int(match.group(1)), int(match.group(2))))
+    counts = set(num_shards for (_index, num_shards) in found)
+    if len(counts) != 1:
+        raise ValueError('expected the shards of one run for %s, found %s' %
+                         (prefix, sorted(found) or 'none'))
+    num_shards = counts.pop()
+    missing = sorted(set(range(1, num_shards + 1)) -
+                     set(index for (index, _count) in found))
+    if missing:
+        raise ValueError('shards %s of %d are missing for %s' %
+                         (missing, num_shards, prefix))
+    return [shard_filename(prefix, index, num_shards)
+            for index in range(1, num_shards + 1)]
+
+
+def merge_shards(prefix):
+    '''
+    Merges the csv files of every shard written with a prefix into
+    <prefix>.lint.csv and <prefix>.score.csv.
+
+    The rows of both files are sorted by filename, so the result
+    does not depend on how the files were split into shards. The
+    instances of each file keep their order by line number. The
+    score file ends with a TOTAL row, with the number of lines and
+    the total penalty of all the files, and the quality score of all
+    the files together as if they were one file.
+
+    Parameters:
+
+        prefix: The start of the names of the csv files.
+
+    Result: The TOTAL row, as a list. Raises ValueError if a shard is
+    missing, or if a file was linted by more than one shard.
+
+    Example:
+    prefix = 'out/repo'
+
+    >>>['TOTAL', 52144, 3175, '9.39']
+
+    Creates out/repo.lint.csv and out/repo.score.csv
+    '''
+    lint_rows = {}
+    score_rows = {}
+    for out_filename in find_shards(prefix):
+        with open(out_filename + 'score.csv') as contents:
+            for row in list(csv.reader(contents))[1:]:
+                if row[0] in score_rows:
+                    raise ValueError('%s was linted by more than one shard' %
+                                     row[0])
+                score_rows[row[0]] = row
+                lint_rows[row[0]] = []
+        with open(out_filename + 'lint.csv') as contents:
+            for row in list(csv.reader(contents))[1:]:
+                lint_rows[row[0]].append(row)
+
+    lint_file = open(prefix + '.lint.csv', 'w')
+    writer = csv.writer(lint_file)
+    writer.writerow(["FILENAME", "ERROR_TYPE", "LINE_NUMBER",
+                     "COLUMN", "INFO", "SOURCE_LINE"])
+    for python_filename in sorted(lint_rows):
+        for row in lint_rows[python_filename]:
+            writer.writerow(row)
+    lint_file.close()
+
+    num_lines = sum(int(row[1]) for row in score_rows.values())
+    total_penalty = sum(int(row[2]) for row in score_rows.values())
+    total = ["TOTAL", num_lines, total_penalty,
+             calculate_quality_score(total_penalty, num_lines)]
+
+    score_file = open(prefix + '.score.csv', 'w')
+    writer = csv.writer(score_file)
+    writer.writerow(["FILENAME", "LINES", "PENALTY", "QUALITY_SCORE"])
+    for python_filename in sorted(score_rows):
+        writer.writerow(score_rows[python_filename])
+    writer.writerow(total)
+    score_file.close()
+    return total
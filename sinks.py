@@ -0,0 +1,275 @@
+'''
+Sinks.
+
+This program writes the instances of bad programming style found
+by lint.py in formats that other tools can read directly, so that
+the .lint.csv file does not have to be converted first. There are
+three formats:
+
+    csv - the same rows as the .lint.csv file written by lint.
+
+    jsonl - JSON Lines, one JSON object for every instance, with the
+    keys "file", "rule", "line", "column", "info" and "source".
+
+    sarif - a SARIF 2.1.0 log, the format code scanning services read,
+    with one result for every instance.
+
+Each format is written by a sink, which is given the instances one
+at a time and writes them out as they arrive. The sinks keep what
+they are given in memory until there is BUFFER_SIZE bytes of it and
+then write it in one go, so a file is written in a few large writes
+instead of one write for every instance. Any of them can compress
+what it writes with gzip. write_instances feeds the same instances
+to several sinks at once, so every format is written in one pass
+over the instances.
+'''
+import csv
+import gzip
+import io
+import json
+import locale
+import os
+
+# The number of bytes a sink keeps before writing them.
+BUFFER_SIZE = 1024 * 1024
+
+# The descriptions of the 4 bad programming styles.
+RULE_DESCRIPTIONS = {
+    "SINGLE_CHAR_VAR": 'a variable name consisting of only a single '
+                       'character, such as x.',
+    "LONG_LINE": 'a line of code that is over 79 characters.',
+    "TRAIL_WHITESPACE": 'a line that contains any space or tab characters '
+                        'immediately before the end of the line.',
+    "BAD_INDENT": 'an indent that is not a multiple of 4 single spaces. '
+                  'This includes tabs.'}
+
+
+def instance_message(instance):
+    '''
+    Returns a one line description of an instance, like the ones in
+    the html report written by report.py.
+
+    Example:
+    instance = ["LONG_LINE", 187, "", 86, "    return get_pixel(..."]
+
+    >>>'Line too long, length = 86.'
+    '''
+    if instance[0] == "SINGLE_CHAR_VAR":
+        return 'Single character variable %s.' % instance[3]
+    if instance[0] == "LONG_LINE":
+        return 'Line too long, length = %s.' % instance[3]
+    if instance[0] == "TRAIL_WHITESPACE":
+        return 'Trailing whitespace.'
+    return 'Bad indent.'
+
+
+class Sink(object):
+    '''
+    The buffering and compression shared by every sink. A sink is
+    made with the name of the file to write, is given instances with
+    write, and must be closed with close once it has them all.
+    Subclasses give the extension of their files, and override
+    header, format_instance and footer to return the bytes to write.
+    '''
+
+    extension = None
+
+    def __init__(self, out_filename, compress=False):
+        if compress:
+            self.out_file = gzip.open(out_filename, 'wb', compresslevel=6)
+        else:
+            self.out_file = open(out_filename, 'wb')
+        self.chunks = []
+        self.size = 0
+        self.emit(self.header())
+
+    def emit(self, data):
+        # Keeps data until there is BUFFER_SIZE bytes to write.
+        self.chunks.append(data)
+        self.size += len(data)
+        if self.size >= BUFFER_SIZE:
+            self.flush()
+
+    def flush(self):
+        self.out_file.write(b''.join(self.chunks))
+        self.chunks = []
+        self.size = 0
+
+    def write(self, python_filename, instance):
+        self.emit(self.format_instance(python_filename, instance))
+
+    def close(self):
+        self.emit(self.footer())
+        self.flush()
+        self.out_file.close()
+
+    def header(self):
+        return b''
+
+    def format_instance(self, python_filename, instance):
+        raise NotImplementedError
+
+    def footer(self):
+        return b''
+
+
+class CsvSink(Sink):
+    '''
+    Writes the same rows as write_lint_csv in lint.py, in the same
+    encoding, a file opened with open(out_filename, 'w') would use.
+    '''
+
+    extension = 'csv'
+
+    def __init__(self, out_filename, compress=False):
+        self.text = io.StringIO()
+        self.writer = csv.writer(self.text)
+        self.encoding = locale.getpreferredencoding(False)
+        Sink.__init__(self, out_filename, compress)
+
+    def row(self, row):
+        self.writer.writerow(row)
+        data = self.text.getvalue().encode(self.encoding)
+        self.text.seek(0)
+        self.text.truncate()
+        return data
+
+    def header(self):
+        return self.row(["ERROR_TYPE", "LINE_NUMBER", "COLUMN", "INFO",
+                         "SOURCE_LINE"])
+
+    def format_instance(self, python_filename, instance):
+        return self.row(instance)
+
+
+class JsonLinesSink(Sink):
+    '''
+    Writes one JSON object for every instance, on a line of its own.
+    The column and info of an instance are null if it has none.
+    '''
+
+    extension = 'jsonl'
+
+    def format_instance(self, python_filename, instance):
+        record = {"file": python_filename,
+                  "rule": instance[0],
+                  "line": instance[1],
+                  "column": instance[2] if instance[2] != '' else None,
+                  "info": instance[3] if instance[3] != '' else None,
+                  "source": instance[4]}
+        return (json.dumps(record, ensure_ascii=False,
+                           separators=(',', ':')) + '\n').encode('utf-8')
+
+
+class SarifSink(Sink):
+    '''
+    Writes a SARIF 2.1.0 log with a single run, whose results are
+    written one at a time between the start and the end of the log.
+    '''
+
+    extension = 'sarif'
+
+    def __init__(self, out_filename, compress=False):
+        self.separator = b''
+        Sink.__init__(self, out_filename, compress)
+
+    def header(self):
+        rules = [{"id": rule_id,
+                  "shortDescription": {"text": RULE_DESCRIPTIONS[rule_id]}}
+                 for rule_id in sorted(RULE_DESCRIPTIONS)]
+        driver = {"name": "lint", "rules": rules}
+        start = json.dumps({
+            "$schema": "https://json.schemastore.org/sarif-2.1.0.json",
+            "version": "2.1.0",
+            "runs": [{"tool": {"driver": driver}, "results": []}]})
+        # The log is written up to the start of the list of results,
+        # which is then filled in by format_instance.
+        return start[:-len(']}]}')].encode('utf-8')
+
+    def format_instance(self, python_filename, instance):
+        region = {"startLine": instance[1],
+                  "snippet": {"text": instance[4]}}
+        if instance[2] != '':
+            region["startColumn"] = instance[2]
+        result = {"ruleId": instance[0],
+                  "level": "warning",
+                  "message": {"text": instance_message(instance)},
+                  "locations": [{"physicalLocation": {
+                      "artifactLocation": {
+                          "uri": python_filename.replace(os.sep, '/')},
+                      "region": region}}]}
+        data = self.separator + json.dumps(result, ensure_ascii=False)\
+            .encode('utf-8')
+        self.separator = b',\n'
+        return data
+
+    def footer(self):
+        return b']}]}\n'
+
+
+# The sink of every format, by name.
+SINKS = {"csv": CsvSink, "jsonl": JsonLinesSink, "sarif": SarifSink}
+
+
+def sink_filename(out_prefix, output_format, compress=False):
+    '''
+    Returns the name of the file a format is written to, such as
+    naughty.lint.sarif.gz for out_prefix 'naughty.', output_format
+    'sarif' and compress True.
+    '''
+    out_filename = out_prefix + 'lint.' + SINKS[output_format].extension
+    if compress:
+        out_filename += '.gz'
+    return out_filename
+
+
+def write_instances(out_prefix, python_filename, instances,
+                    formats=("csv",), compress=False):
+    '''
+    Writes instances of bad programming style in several formats,
+    in a single pass over the instances.
+
+    The uncompressed .lint.csv file is always written, whatever the
+    formats, so that it is never left over from an earlier run next
+    to a newer score log and line index. The csv format is only
+    written again if it is to be compressed.
+
+    Parameters:
+
+        out_prefix: The start of the names of the files to write,
+                    such as python_filename[:-2].
+        python_filename: The python file the instances were found in.
+        instances: The instances, in any iterable, such as the list
+                   returned by find_all_instances in lint.py or the
+                   generator returned by generate_instances.
+        formats: The names of the formats to write, from SINKS.
+        compress: Whether to compress the files with gzip.
+
+    Result: The number of instances written.
+
+    Example:
+    out_prefix = 'naughty.'
+    python_filename = 'naughty.py'
+    formats = ['jsonl', 'sarif']
+
+    >>>66
+
+    Creates naughty.lint.csv, naughty.lint.jsonl and naughty.lint.sarif
+    '''
+    sinks = []
+    num_instances = 0
+    try:
+        sinks.append(CsvSink(sink_filename(out_prefix, "csv")))
+        for output_format in formats:
+            if output_format != "csv" or compress:
+                sinks.append(SINKS[output_format](
+                    sink_filename(out_prefix, output_format, compress),
+                    compress))
+        for instance in instances:
+            num_instances += 1
+            for sink in sinks:
+                sink.write(python_filename, instance)
+    finally:
+        for sink in sinks:
+            sink.close()
+    return num_instances
@@ -6,13 +6,36 @@ Author: Bernie Pope (bjpope@unimelb.edu.au).
 This module contains utility code which is helpful for implementing
 COMP10001 Project 3, a Python style checking program.
 
-It contains the following three functions:
+It contains the following ten functions:
 
     - vars_indents: collects variable names and indentation
           information from a Python file. The results are returned in a
           2-tuple of dictionaries, one for variables and one for indentation.
           The dictionaries are indexed by line number.
 
+    - generate_vars_indents: generates the same variable names and
+          indentation information as vars_indents one at a time, so that
+          callers can stop before the whole file has been tokenized.
+
+    - token_tables: collects the same information as vars_indents into
+          compact arrays of numbers instead of dictionaries of tuples,
+          for large files with many variables.
+
+    - read_source: reads the lines of a Python file as bytes, and finds
+          the encoding they should be decoded with.
+
+    - split_source: finds the encoding of the contents of a Python file
+          that have already been read, and splits them into lines the
+          same way as read_source.
+
+    - line_offsets: finds where every line of a Python file starts, so
+          that any line can later be read without reading the lines
+          before it.
+
+    - token_checks_possible: decides quickly, without tokenizing,
+          whether a Python file could have any single character
+          variables or bad indents at all.
+
     - get_current_date_time: returns the current date and time at the
           point when the function is called. The result is returned as a
           string in the format: <year>-<month>-<day> <hour>:<min>:<sec>
@@ -20,6 +43,10 @@ It contains the following three functions:
     - plot_graph: plots a line graph from an input data set and saves the
           result to a SVG file.
 
+    - downsample_lttb: picks a shape-preserving subset of the points in a
+          data set so that long histories can be plotted with a bounded
+          number of points.
+
 Revision history:
 
 22 Sep 2014: Initial version.
@@ -29,7 +56,12 @@ Revision history:
 
 VERSION = 1.0
 
-from tokenize import generate_tokens
+import re
+from codecs import BOM_UTF8
+from array import array
+from io import BytesIO
+from itertools import accumulate
+from tokenize import generate_tokens, detect_encoding
 from token import NAME, INDENT
 from keyword import iskeyword
 from datetime import datetime
@@ -39,8 +71,12 @@ import matplotlib
 matplotlib.use('svg', warn=False)
 import matplotlib.pyplot as plt
 
+# The array type code of the token tables, the smallest that holds
+# any line number.
+TABLE_TYPECODE = 'I' if array('I').itemsize >= 4 else 'L'
 
-def vars_indents(python_filename):
+
+def vars_indents(python_filename, lines=None, encoding=None):
     '''Read the contents of a Python file and find all variables and all
     indents. The results are returned as a pair of dictionaries which are
     indexed by line number. Line numbers start at 1. Multiple variables can
@@ -51,6 +87,9 @@ def vars_indents(python_filename):
     Parameters:
 
         python_filename: a string, the name of the input Python file.
+        lines: an optional list of the lines to tokenize instead of reading
+            the file, as described in generate_vars_indents.
+        encoding: the encoding of lines, if they are bytes.
 
     Result:
 
@@ -86,7 +125,7 @@ def vars_indents(python_filename):
 
         This function does no error checking. It assumes that the input file
         exists and can be read by the program. It also assumes that the input
-        is syntactically correct Python code.
+        is syntactically correct Python code in the encoding it declares.
 
         Missing files, files that cannot be read, or files that do not contain
         Python code may cause this function to raise exceptions.
@@ -99,24 +138,11 @@ def vars_indents(python_filename):
          {129: ('                ', 17), 163: ('    ', 5), ... })
     '''
 
-    python_file = open(python_filename)
-    # Obtain a generator for all lexical tokens for the input Python file.
-    token_gen = generate_tokens(python_file.readline)
     variables = {}
     indents = {}
-    # Iterate over all tokens in the file and collect those corresponding to
-    # variables (a subset of NAME tokens) and indents (the INDENT token).
-    for (token_type, token_text, start_pos, end_pos, _src_line) in token_gen:
-        # Check for variables.
-        if token_type == NAME and not iskeyword(token_text):
-            # Variables are NAME tokens which are not keywords.
-            line_number, start_col = start_pos
-            # We record the variable name as a string, plus the column
-            # coordinate of the first character in the name. The tokenizer
-            # starts columns at 0, but we prefer columns to start at 1, so we
-            # adjust accordingly by adding 1. Most text editors report column
-            # numbers starting from 1.
-            token_info = (token_text, start_col + 1)
+    for (token_type, line_number, token_info) in \
+            generate_vars_indents(python_filename, lines, encoding):
+        if token_type == NAME:
             # We record all variables occurring on the same line in a list.
             # The variables dictionary is indexed by line number.
             if line_number in variables:
@@ -127,15 +153,362 @@ def vars_indents(python_filename):
                 # We have not seen this line number before, record this
                 # as the first variable for the line as a singleton list.
                 variables[line_number] = [token_info]
+        else:
+            # There can only be one indent at most per line.
+            indents[line_number] = token_info
+    return variables, indents
+
+
+def generate_vars_indents(python_filename, lines=None, encoding=None):
+    '''Generate the variables and indents of a Python file one at a time,
+    in the order they appear in the file. This is the same information that
+    vars_indents collects, but because the file is tokenized lazily, a
+    caller that only needs the first few variables or indents can stop
+    early without tokenizing the rest of the file.
+
+    Parameters:
+
+        python_filename: a string, the name of the input Python file.
+        lines: an optional list of strings, or of bytes as returned by
+            read_source, the lines to tokenize instead of reading the file.
+            This allows part of a file to be tokenized on its own, in which
+            case the line numbers count from the first line given.
+        encoding: the encoding of lines, if they are bytes. Each line is
+            decoded only when the tokenizer reaches it.
+
+    Result:
+
+        A generator of 3-tuples. The first item is token.NAME for a variable
+        or token.INDENT for an indent. The second item is the integer line
+        number, such that the first line number is 1. The third item is the
+        2-tuple describing the variable or indent, in the same format as
+        the values of the dictionaries returned by vars_indents.
+
+    Example (truncated for brevity):
+
+        >>> list(generate_vars_indents("utils.py"))
+        [(1, 30, ('VERSION', 1)), ... (5, 129, ('                ', 17)),
+         (1, 129, ('variables', 17)), ... ]
+    '''
+    if lines is None:
+        _source, encoding, lines = read_source(python_filename)
+    if encoding is not None:
+        lines = (each_line.decode(encoding) for each_line in lines)
+    for token in _generate_vars_indents(iter(lines).__next__):
+        yield token
+
+
+def token_tables(python_filename, lines=None, encoding=None):
+    '''Collect the variables and indents of a Python file into parallel
+    arrays of numbers. This is the same information that vars_indents
+    collects, but each variable takes 12 bytes in three arrays instead of
+    a tuple in a list in a dictionary, and every variable name is stored
+    only once, however many times it appears. The arrays can be searched
+    without a Python loop, for example with numpy.frombuffer.
+
+    Parameters:
+
+        python_filename: a string, the name of the input Python file.
+        lines: an optional list of the lines to tokenize instead of reading
+            the file, as described in generate_vars_indents.
+        encoding: the encoding of lines, if they are bytes.
+
+    Result:
+
+        A dictionary of the following tables:
+
+            VARIABLE_LINES: an array of the line number of every variable,
+                in the order they appear in the file.
+            VARIABLE_COLUMNS: an array of the column number of the first
+                character of every variable.
+            VARIABLE_NAMES: an array of the name ID of every variable,
+                which is the index of its name in NAMES.
+            NAMES: a list of the different variable names, as strings.
+            INDENT_WIDTHS: an array with one entry for every line number,
+                and one for line 0, which is the number of characters in
+                the indent on that line, or 0 if there is none. The column
+                number immediately after an indent is its width plus 1.
+            INDENT_SPACES: an array of the number of spaces in the indent
+                on every line, indexed in the same way as INDENT_WIDTHS.
+            INDENT_TABS: an array of the number of tabs in the indent on
+                every line, indexed in the same way as INDENT_WIDTHS.
+
+        The arrays hold unsigned integers of the type TABLE_TYPECODE.
+
+    Example (truncated for brevity):
+
+        >>> tables = token_tables("utils.py")
+        >>> tables["NAMES"][tables["VARIABLE_NAMES"][0]]
+        'VERSION'
+        >>> tables["INDENT_WIDTHS"][129]
+        16
+    '''
+    if lines is None:
+        _source, encoding, lines = read_source(python_filename)
+    variable_lines = array(TABLE_TYPECODE)
+    variable_columns = array(TABLE_TYPECODE)
+    variable_names = array(TABLE_TYPECODE)
+    names = []
+    name_ids = {}
+    indent_widths = array(TABLE_TYPECODE, [0]) * (len(lines) + 1)
+    indent_spaces = array(TABLE_TYPECODE, [0]) * (len(lines) + 1)
+    indent_tabs = array(TABLE_TYPECODE, [0]) * (len(lines) + 1)
+    for (token_type, line_number, (token_text, column)) in \
+            generate_vars_indents(python_filename, lines, encoding):
+        if token_type == NAME:
+            # Each different name is given the next ID the first time
+            # it is seen.
+            name_id = name_ids.get(token_text)
+            if name_id is None:
+                name_id = name_ids[token_text] = len(names)
+                names.append(token_text)
+            variable_lines.append(line_number)
+            variable_columns.append(column)
+            variable_names.append(name_id)
+        else:
+            indent_widths[line_number] = column - 1
+            indent_spaces[line_number] = token_text.count(' ')
+            indent_tabs[line_number] = token_text.count('\t')
+    return {"VARIABLE_LINES": variable_lines,
+            "VARIABLE_COLUMNS": variable_columns,
+            "VARIABLE_NAMES": variable_names,
+            "NAMES": names,
+            "INDENT_WIDTHS": indent_widths,
+            "INDENT_SPACES": indent_spaces,
+            "INDENT_TABS": indent_tabs}
+
+
+def read_source(python_filename):
+    '''Read the contents of a Python file as bytes, without decoding them,
+    and split them into lines. The encoding of the file is found the same
+    way Python itself finds it, from a UTF-8 byte order mark or a PEP 263
+    coding comment on the first two lines, and is UTF-8 otherwise.
+
+    The lines are split the same way as a file opened in text mode would
+    split them, so the line numbers agree with those of the tokenizer.
+    Every line ending, whether it is a newline, a carriage return and a
+    newline, or a carriage return on its own, is changed to a newline.
+    A byte order mark is left out of the lines.
+
+    Parameters:
+
+        python_filename: a string, the name of the input Python file.
+
+    Result:
+
+        A 3-tuple of the contents of the file as bytes, exactly as they
+        were read, the name of the encoding as a string, and a list of the
+        lines of the file as bytes.
+
+    Example:
+
+        >>> read_source("naughty.py")
+        (b'"""Edge detection.\\r\\n\\r\\nAuthor: Bernie Pope ...', 'utf-8',
+         [b'"""Edge detection.\\n', b'\\n', b'Author: Bernie Pope ...', ...])
+    '''
+    with open(python_filename, 'rb') as python_file:
+        source = python_file.read()
+    return (source,) + split_source(source)
+
+
+def split_source(source):
+    '''Find the encoding of the contents of a Python file and split them
+    into lines, as described in read_source, for contents that have
+    already been read.
+
+    Parameters:
+
+        source: the contents of the input Python file, as bytes.
+
+    Result:
+
+        A 2-tuple of the name of the encoding as a string, and a list of
+        the lines of the file as bytes.
+
+    Example:
+
+        >>> split_source(b'x = 1\r\ny = 2\r\n')
+        ('utf-8', [b'x = 1\n', b'y = 2\n'])
+    '''
+    encoding = detect_encoding(BytesIO(source).readline)[0]
+    text = source
+    if encoding == 'utf-8-sig':
+        text = text[len(BOM_UTF8):]
+        encoding = 'utf-8'
+    if b'\r' in text:
+        text = text.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    return encoding, text.splitlines(True)
+
+
+def _generate_vars_indents(readline):
+    '''Generate the variables and indents of the lines returned by
+    readline, as described in generate_vars_indents.'''
+    # Obtain a generator for all lexical tokens for the input Python file.
+    token_gen = generate_tokens(readline)
+    # Iterate over all tokens in the file and pick out those corresponding
+    # to variables (a subset of NAME tokens) and indents (the INDENT
+    # token).
+    for (token_type, token_text, start_pos, end_pos, _src_line) \
+            in token_gen:
+        # Check for variables.
+        if token_type == NAME and not iskeyword(token_text):
+            # Variables are NAME tokens which are not keywords.
+            line_number, start_col = start_pos
+            # We record the variable name as a string, plus the column
+            # coordinate of the first character in the name. The
+            # tokenizer starts columns at 0, but we prefer columns to
+            # start at 1, so we adjust accordingly by adding 1. Most text
+            # editors report column numbers starting from 1.
+            yield NAME, line_number, (token_text, start_col + 1)
         # Check for indents.
         elif token_type == INDENT:
-            # There can only be one indent at most per line. We record the
-            # coordinate of the character immediately after the indent.
+            # We record the coordinate of the character immediately
+            # after the indent.
             line_number, end_col = end_pos
-            token_info = (token_text, end_col + 1)
-            indents[line_number] = token_info
-    python_file.close()
-    return variables, indents
+            yield INDENT, line_number, (token_text, end_col + 1)
+
+
+def line_offsets(source):
+    '''Find the offset in bytes of the start of every line of a Python
+    file. The lines are split in the same places as read_source splits
+    them, so line number n of the file starts at offset n - 1 and ends
+    just before offset n of the result, including its line ending.
+
+    Parameters:
+
+        source: a bytes object, the contents of the input Python file
+            exactly as they were read.
+
+    Result:
+
+        An array of unsigned 64 bit integers, with one more item than there
+        are lines. The last item is the length of source.
+
+    Example:
+
+        >>> line_offsets(b"x = 1\\r\\ny = 2\\n\\nz")
+        array('Q', [0, 7, 13, 14, 15])
+    '''
+    start = len(BOM_UTF8) if source.startswith(BOM_UTF8) else 0
+    if b'\r' in source:
+        offsets = array('Q', [start])
+        offsets.extend(match.end() for match in
+                       LINE_ENDING.finditer(source, start))
+    else:
+        offsets = array('Q', accumulate(
+            map(len, source[start:].splitlines(True)), initial=start))
+    if offsets[-1] != len(source):
+        # The last line has no line ending.
+        offsets.append(len(source))
+    return offsets
+
+
+# Any of the line endings that a file opened in text mode splits lines at.
+LINE_ENDING = re.compile(br'\r\n|\r|\n')
+
+# Strings and comments, found from left to right so that a quote inside a
+# comment or a hash inside a string is never mistaken for the start of the
+# other. The prefix of a string is kept separate, so that f-strings, which
+# can contain variables, are not thrown away with the other strings.
+STRING_OR_COMMENT = re.compile(
+    br'(?P<prefix>(?<![A-Za-z0-9_])[rRbBuUfF]{1,2})?'
+    br'(?P<string>"""(?:[^"\\]|\\.|"(?!""))*"""'
+    br"|'''(?:[^'\\]|\\.|'(?!''))*'''"
+    br'|"(?:[^"\\\r\n]|\\(?:\r\n|.))*"'
+    br"|'(?:[^'\\\r\n]|\\(?:\r\n|.))*')"
+    br'|#[^\r\n]*', re.DOTALL)
+
+# Words of letters, digits and underscores which the tokenizer could read as,
+# or end with, a variable of a single character. These are a single letter
+# or underscore, or a number which ends in a letter, such as 1j or 0xf,
+# since the tokenizer reads any letters following a number as a name.
+SINGLE_CHAR_WORD = re.compile(
+    br'(?<![A-Za-z0-9_])(?:[A-Za-z_]|[0-9][A-Za-z0-9_]*[A-Za-z_])'
+    br'(?![A-Za-z0-9_])')
+
+# The start of a line indented by a number of spaces that is not a multiple
+# of 4, or by whitespace which includes a tab.
+BAD_INDENT_START = re.compile(
+    br'^(?:    )*(?: {1,3}(?=[^ \t\f\r\n])| *\t)', re.MULTILINE)
+
+
+def token_checks_possible(source, encoding=None):
+    '''Quickly and conservatively decide whether the variables and indents
+    found by vars_indents could include a variable of a single character,
+    or an indent that is not a multiple of 4 spaces. This works directly
+    on the bytes of the file using regular expressions, which is much
+    faster than tokenizing the file, so the tokenizer only needs to run
+    when one of these could be found.
+
+    The answer is allowed to be a false positive, but never a false
+    negative. Strings and comments are blanked out first, keeping the
+    contents of f-strings, and the remaining code is searched for words
+    that the tokenizer could read as single character variables, and for
+    lines whose indentation is bad. Whenever the file uses something that
+    this quick check does not handle exactly, such as a non-ASCII
+    identifier, a string that is not closed, a form feed, carriage
+    returns on their own as line endings, or an encoding that is not
+    UTF-8, both checks are assumed to be possible.
+
+    Parameters:
+
+        source: a bytes object, the contents of the input Python file.
+        encoding: the encoding of source, if it is known. Otherwise it is
+            found from source, as the tokenizer would find it.
+
+    Result:
+
+        A 2-tuple of booleans. The first is False only if there cannot be a
+        variable of a single character. The second is False only if there
+        cannot be a bad indent.
+
+    Example:
+
+        >>> token_checks_possible(b"def area(width, height):\n"
+        ...                       b"    return width * height  # a, b\n")
+        (False, False)
+    '''
+    if b'\f' in source or re.search(br'\r(?!\n)', source):
+        return True, True
+    if not source.isascii():
+        # Only UTF-8 can be searched safely as bytes, since in some other
+        # encodings the bytes of a character can look like a quote or a
+        # backslash.
+        try:
+            if encoding is None:
+                encoding = detect_encoding(BytesIO(source).readline)[0]
+            source.decode(encoding)
+        except (SyntaxError, UnicodeDecodeError):
+            return True, True
+        if encoding not in ('utf-8', 'utf-8-sig'):
+            return True, True
+        if source.startswith(BOM_UTF8):
+            source = source[len(BOM_UTF8):]
+
+    code = STRING_OR_COMMENT.sub(_blank_string_or_comment, source)
+    if b'"' in code or b"'" in code:
+        # A string was not closed, so the strings may have been found
+        # in the wrong places.
+        return True, True
+    variables_possible = (SINGLE_CHAR_WORD.search(code) is not None or
+                          not code.isascii())
+    indents_possible = BAD_INDENT_START.search(code) is not None
+    return variables_possible, indents_possible
+
+
+def _blank_string_or_comment(match):
+    '''Replace a string or comment matched by STRING_OR_COMMENT. Comments
+    are removed. Strings are replaced by the line endings they contain
+    between two dots, so that the lines of the code stay as they were and
+    the line a string starts on is not mistaken for a blank line. The
+    contents of f-strings are kept, with their quotes replaced by dots.'''
+    string = match.group('string')
+    if string is None:
+        return b''
+    prefix = match.group('prefix') or b''
+    if b'f' in prefix or b'F' in prefix:
+        return string.replace(b'"', b'.').replace(b"'", b'.')
+    return b'.' + b'\n' * string.count(b'\n') + b'.'
 
 
 def get_current_date_time():
@@ -209,3 +582,65 @@ def plot_graph(data, x_axis_ticks, max_y_val, xlabel, ylabel, title, filename):
     # It is necessary to close the plot, so that new graphs appear in
     # separate figures.
     plt.close()
+
+
+def downsample_lttb(data, num_points):
+    '''Downsample a numerical data set using the largest-triangle-three-buckets
+    algorithm. The first and last points are always kept. The points in
+    between are split into num_points - 2 buckets of (almost) equal size, and
+    from each bucket we keep the point which forms the largest triangle with
+    the previously kept point and the average of the next bucket. This keeps
+    the peaks and troughs of the data, so the shape of a line graph drawn from
+    the result stays faithful to the original data.
+
+    Arguments:
+
+        data: A list of numbers (either integers or floating point).
+        num_points: The maximum number of points to keep, as an integer.
+            Values less than 3 are treated as 3.
+
+    Result:
+
+        A list of the integer indices of the kept points in ascending order.
+        If data has no more than num_points items, every index is returned.
+
+    Example:
+
+        >>> downsample_lttb([1, 5, 2, 8, 3, 9, 4, 0], 4)
+        [0, 3, 5, 7]
+    '''
+    num_points = max(num_points, 3)
+    if len(data) <= num_points:
+        return list(range(len(data)))
+    num_buckets = num_points - 2
+    kept = [0]
+    previous = 0
+    for bucket in range(num_buckets):
+        # The current bucket and the bucket following it. The last point of
+        # the data is used as the "next bucket" of the final bucket. The
+        # edges are worked out with integers, so that the last bucket always
+        # ends just before the last point, whatever rounding would do.
+        start = bucket * (len(data) - 2) // num_buckets + 1
+        end = (bucket + 1) * (len(data) - 2) // num_buckets + 1
+        next_end = min((bucket + 2) * (len(data) - 2) // num_buckets + 1,
+                       len(data))
+        if end >= next_end:
+            next_start, next_end = len(data) - 1, len(data)
+        else:
+            next_start = end
+        avg_x = (next_start + next_end - 1) / 2.0
+        avg_y = sum(data[next_start:next_end]) / float(next_end - next_start)
+        # Keep the point with the largest triangle area. The area is halved
+        # for every point alike, so we compare the doubled areas.
+        prev_y = data[previous]
+        best_area = -1
+        for index in range(start, end):
+            area = abs((previous - avg_x) * (data[index] - prev_y) -
+                       (previous - index) * (avg_y - prev_y))
+            if area > best_area:
+                best_area = area
+                best_index = index
+        kept.append(best_index)
+        previous = best_index
+    kept.append(len(data) - 1)
+    return kept
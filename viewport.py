@@ -0,0 +1,555 @@
+'''
+Viewport.
+
+This program lints the part of a python file that is on the screen
+of an editor first, and the rest of the file afterwards for as long
+as there is time, so that an editor plugin can show the instances of
+bad programming style on every keystroke, even in very long files.
+
+The file is split into chunks of whole logical lines. The long line
+and trailing whitespace checks only need the lines of a chunk, and
+the single character variable and bad indent checks only need the
+tokens of a chunk. To tokenize a chunk on its own, the tokenizer
+must start it in the same state as it would be in after reading
+every line before it: outside any string or bracket, and with the
+same stack of indents. The start of every logical line, and the
+indents open at it, are found with a quick scan that blanks out
+the strings and comments with STRING_OR_COMMENT from utils.py and
+counts the brackets of the rest. Each chunk is then tokenized after
+a few made-up lines, one for every open indent, so the instances
+found in a chunk are exactly the ones lint from lint.py finds on
+its lines.
+
+The chunks holding the lines on the screen are linted first, then
+the chunks after and before them in turn, working outwards, until
+the whole file is done or the time budget runs out.
+
+The scan cannot get past a quote that does not start a whole string,
+which is what a file looks like while a string is being typed. The
+lines after it are tokenized from the last logical line start before
+it, and if the lines on the screen are among them, only those lines
+are linted first.
+
+The logical line starts found in a file are kept for the next call,
+so that after an edit the scan starts again from the first changed
+line, instead of from the top of the file.
+'''
+import re
+import time
+from bisect import bisect_right
+from itertools import chain
+from token import NAME
+from tokenize import TokenError
+from lint import FIND_ORDER, check_long_line, check_trail_whitespace, \
+    check_single_char_variable, check_bad_indent
+from utils import STRING_OR_COMMENT, generate_vars_indents, \
+    token_checks_possible, read_source
+
+# The number of lines to aim for in each chunk after the one on the
+# screen.
+CHUNK_SIZE = 200
+
+# A quote that does not start a whole string, but which the tokenizer
+# reads as the start of a string continued onto the next line with a
+# backslash.
+CONTINUED_STRING = re.compile(
+    br'"(?:[^\r\n"\\]|\\.)*\\\r?\n|\'(?:[^\r\n\'\\]|\\.)*\\\r?\n')
+
+# The brackets counted by the scan.
+OPENING_BRACKETS = b'([{'
+CLOSING_BRACKETS = b')]}'
+
+# The number of files whose logical line starts are kept between calls.
+MAX_SCANS = 16
+
+# The scans of the files linted most recently, by file name, oldest
+# first, as returned by get_scan.
+SCANS = {}
+
+
+def _blank_for_scan(match):
+    '''Replace a string or comment matched by STRING_OR_COMMENT. Comments
+    are removed, and strings are replaced by a 0 for each line they
+    are on, joined by backslashes and line endings, so that every line
+    a string continues onto looks like a continued line.'''
+    if match.group('string') is None:
+        return b''
+    return b'\\\n'.join([b'0'] * (match.group(0).count(b'\n') + 1))
+
+
+def generate_blank_lines(lines):
+    '''
+    Generates the lines of a python file with its strings and comments
+    blanked out by _blank_for_scan, so that what is left can be
+    scanned for brackets and continued lines. The strings are found
+    only as far as the lines are asked for, so the time taken grows
+    with the number of lines generated, not the size of the file.
+
+    A quote that does not start a whole string on its line, such as
+    a string that is still being typed, is read by the tokenizer as
+    an error on its own, and the tokenizer goes on after it. It is
+    blanked out in the same way. But three quotes start a string that
+    the tokenizer reads to the end of the file, and a quote followed
+    by a backslash at the end of its line starts a string that the
+    tokenizer reads on the next line in a way the scan cannot follow.
+
+    Parameters:
+
+        lines: The lines of the program, as bytes.
+
+    Result: A generator of the blanked lines, one for every line, up
+    to the line before the first of these quotes, followed by None if
+    it was three quotes. The lines from there on cannot be scanned and
+    are not generated.
+
+    Example:
+    lines = [b'x = "#" # a comment\n', b'y = """a\n', b'b"""\n']
+
+    >>>[b'x = 0 \n', b'y = 0\\\n', b'0\n']
+    '''
+    text = b''.join(lines)
+    position = 0
+    pending = b''
+    for match in chain(STRING_OR_COMMENT.finditer(text), [None]):
+        if match is None:
+            code = text[position:]
+        else:
+            code = text[position:match.start()]
+        quotes = [index for index in (code.find(b'"'), code.find(b"'"))
+                  if index >= 0]
+        while quotes:
+            index = min(quotes)
+            at = position + index
+            quote = text[at:at + 1]
+            # Two quotes before this one are an empty string to the
+            # scan, but the start of three quotes to the tokenizer.
+            three_quotes = text[at:at + 3] == quote * 3 or \
+                (at >= 2 and text[at - 2:at] == quote * 2)
+            if three_quotes or CONTINUED_STRING.match(text, at):
+                pending += code[:index]
+                for each_line in pending.splitlines(True)[:-1]:
+                    yield each_line
+                if three_quotes:
+                    yield None
+                return
+            code = code[:index] + b'0' + code[index + 1:]
+            quotes = [each for each in (code.find(b'"', index),
+                                        code.find(b"'", index))
+                      if each >= 0]
+        pending += code
+        if match is not None:
+            pending += _blank_for_scan(match)
+            position = match.end()
+        if b'\n' in pending:
+            cut = pending.rindex(b'\n') + 1
+            for each_line in pending[:cut].splitlines(True):
+                yield each_line
+            pending = pending[cut:]
+    if pending:
+        yield pending
+
+
+def indent_column(indent):
+    '''
+    Returns the column the tokenizer gives the end of an indent, with
+    tabs moving to the next multiple of 8 and form feeds starting
+    again from 0.
+    '''
+    column = 0
+    for each_char in indent:
+        if each_char == 0x20:
+            column += 1
+        elif each_char == 0x09:
+            column = (column // 8 + 1) * 8
+        else:
+            column = 0
+    return column
+
+
+def logical_line_starts(lines, start=1, indents=()):
+    '''
+    Generates the line number of the start of every logical line of
+    a python file, with the indents open when the tokenizer reaches
+    it, in order, followed by the line number the scan stopped at.
+
+    A logical line starts on a line which is not blank or a comment,
+    not inside a string or a bracket, and not continued from the line
+    before with a backslash. The indents open at it are the indents
+    the tokenizer has on its stack, not counting the indent of the
+    outermost level.
+
+    Parameters:
+
+        lines: The lines of the program, as bytes.
+        start: The line number to start the scan at, which must be
+               the start of a logical line, or 1.
+        indents: The indents open at line start, as generated for it
+                 by an earlier scan.
+
+    Result: A generator of (line number, indents) tuples, where the
+    indents are a tuple of the whitespace of each open indent, as
+    bytes. The last tuple is the line number after the last line that
+    generate_blank_lines could blank out, which is the number of lines
+    plus 1 if the whole file was scanned, with None as its indents, or
+    False if the rest of the file is inside a string that starts on
+    that line.
+
+    Example:
+    lines = [b'def f():\n', b'    return (1,\n', b'2)\n', b'x = f()\n']
+
+    >>>[(1, ()), (2, ()), (4, (b'    ',)), (5, None)]
+    '''
+    depth = 0
+    continued = False
+    stack = [(0, b'')] + [(indent_column(each_indent), each_indent)
+                          for each_indent in indents]
+    line_count = start - 1
+    for each_line in generate_blank_lines(lines[start - 1:]):
+        if each_line is None:
+            yield line_count + 1, False
+            return
+        line_count += 1
+        if depth == 0 and not continued:
+            body = each_line.lstrip(b' \t\f')
+            if body and body != b'\n':
+                indent = each_line[:len(each_line) - len(body)]
+                yield line_count, tuple(each[1] for each in stack[1:])
+                column = indent_column(indent)
+                if column > stack[-1][0]:
+                    stack.append((column, indent))
+                while column < stack[-1][0]:
+                    stack.pop()
+        for each_char in OPENING_BRACKETS:
+            depth += each_line.count(each_char)
+        for each_char in CLOSING_BRACKETS:
+            depth -= each_line.count(each_char)
+        continued = each_line.endswith(b'\\\n') or each_line.endswith(b'\\')
+    yield line_count + 1, None
+
+
+def get_scan(python_filename, lines):
+    '''
+    Returns the scan of a python file by logical_line_starts, as far
+    as it has got, kept in SCANS for the next call. If the file has
+    changed since the last call, the starts on the lines before the
+    first changed line are kept, and the scan starts again from the
+    last of them.
+
+    Parameters:
+
+        python_filename: The python file the lines come from.
+        lines: The lines of the program, as bytes.
+
+    Result: A dictionary with the keys:
+
+        "LINES": The lines that were scanned.
+        "STARTS": A sorted list of the logical line starts found so far.
+        "INDENTS": A dictionary from every start to the indents open
+                   at it.
+        "STRING_TO_END": True if the scan stopped at a string that
+                         runs to the end of the file.
+        "END": The line number the scan stopped at, or None if the
+               scan has not stopped yet.
+        "GENERATOR": The generator of logical_line_starts that the
+                     rest of the starts are taken from.
+    '''
+    scan = SCANS.pop(python_filename, None)
+    if scan is None or scan["LINES"] != lines:
+        starts = []
+        indents = {}
+        if scan is not None:
+            # The number of lines at the start of the file that are
+            # unchanged.
+            num_same = 0
+            old_lines = scan["LINES"]
+            while num_same < min(len(old_lines), len(lines)) and \
+                    old_lines[num_same] == lines[num_same]:
+                num_same += 1
+            starts = scan["STARTS"][:bisect_right(scan["STARTS"],
+                                                  num_same)]
+            indents = dict((start, scan["INDENTS"][start])
+                           for start in starts)
+        # The scan starts again at the last start kept, which it then
+        # generates again.
+        start = starts.pop() if starts else 1
+        scan = {"LINES": lines,
+                "STARTS": starts,
+                "INDENTS": indents,
+                "STRING_TO_END": False,
+                "END": None,
+                "GENERATOR": logical_line_starts(
+                    lines, start, indents.pop(start, ()))}
+    SCANS[python_filename] = scan
+    while len(SCANS) > MAX_SCANS:
+        del SCANS[next(iter(SCANS))]
+    return scan
+
+
+def scan_past(scan, line_number):
+    '''
+    Continues a scan returned by get_scan until it has found a start
+    after line_number, or has stopped.
+    '''
+    starts = scan["STARTS"]
+    while scan["END"] is None and (not starts or starts[-1] <= line_number):
+        start, open_indents = next(scan["GENERATOR"])
+        if open_indents is None or open_indents is False:
+            scan["STRING_TO_END"] = open_indents is False
+            scan["END"] = start
+        else:
+            starts.append(start)
+            scan["INDENTS"][start] = open_indents
+
+
+def lint_chunk(python_filename, lines, encoding, start, end, indents,
+               token_start=None, token_end=None):
+    '''
+    Finds every instance of bad programming style on the lines start
+    to end - 1 of a python file, which should start with a logical
+    line and end just before one, or at the end of the file.
+
+    The lines are tokenized after one made-up line for each of the
+    indents open at the start of the chunk, so that the tokenizer
+    finds the same indents as it does when reading the whole file.
+    The instances on the made-up lines are left out. A chunk that does
+    not start with a logical line is tokenized from the start of a
+    logical line before it, given by token_start, and the instances
+    before the chunk are left out too. The lines from token_end on are
+    not tokenized, for when they are inside a string that runs to the
+    end of the file.
+
+    Code being edited often cannot be tokenized, for example while a
+    bracket is still open. If the chunk cannot be tokenized, lint
+    would give up on the whole file, but here the instances found
+    before the error are kept.
+
+    Parameters:
+
+        python_filename: The python file the lines come from.
+        lines: The lines of the program, as bytes.
+        encoding: The encoding of the lines.
+        start: The line number of the first line of the chunk.
+        end: The line number after the last line of the chunk.
+        indents: The indents open at the line tokenizing starts at, as
+                 generated by logical_line_starts.
+        token_start: The line number to start tokenizing at, or None
+                     to start at the first line of the chunk.
+        token_end: The line number to stop tokenizing before, or None
+                   to tokenize to the end of the chunk.
+
+    Result: A list of the instances, sorted in the same order as
+    find_all_instances in lint.py sorts them.
+    '''
+    if token_start is None:
+        token_start = start
+    if token_end is None:
+        token_end = end
+    list_total = []
+    for line_number in range(start, end):
+        each_line = lines[line_number - 1]
+        instance = check_long_line(line_number, each_line, encoding)
+        if instance:
+            list_total.append(instance)
+        instance = check_trail_whitespace(line_number, each_line, encoding)
+        if instance:
+            list_total.append(instance)
+
+    chunk = [each_indent + b'0\n' for each_indent in indents] + \
+        lines[token_start - 1:min(end, token_end) - 1]
+    if token_checks_possible(b''.join(chunk), encoding) != (False, False):
+        # The line numbers of the tokens count from the first made-up
+        # line, and are moved to count from the start of the file.
+        offset = token_start - 1 - len(indents)
+        try:
+            for (token_type, line_number, token_info) in \
+                    generate_vars_indents(python_filename, chunk, encoding):
+                if line_number + offset < start:
+                    continue
+                if token_type == NAME:
+                    instance = check_single_char_variable(
+                        line_number, token_info, chunk, encoding)
+                else:
+                    instance = check_bad_indent(line_number, token_info,
+                                                chunk, encoding)
+                if instance:
+                    instance[1] += offset
+                    list_total.append(instance)
+        except (TokenError, SyntaxError, UnicodeDecodeError):
+            pass
+
+    list_total.sort(key=lambda tup: (tup[1], FIND_ORDER[tup[0]]))
+    return list_total
+
+
+def generate_viewport(python_filename, first, last, chunk_size=CHUNK_SIZE):
+    '''
+    Lints a python file chunk by chunk, starting with the lines first
+    to last, then working outwards through the chunks after and
+    before them in turn, and generates the instances of every chunk
+    as soon as it has been linted.
+
+    The first chunk starts at the logical line that line first is
+    part of, and ends after the logical line that line last is part
+    of. If the scan cannot get that far, the first chunk is the lines
+    first to last, and the lines after it are one more chunk. The
+    other chunks are about chunk_size lines long. Only as much of the
+    file as is needed to find the chunks is scanned, starting from
+    the first line changed since the last call, so after the first
+    call the first chunk takes about as long as its own size.
+
+    Parameters:
+
+        python_filename: The python file to lint.
+        first: The line number of the first line on the screen.
+        last: The line number of the last line on the screen.
+        chunk_size: The number of lines to aim for in each of the
+                    other chunks.
+
+    Result: A generator of ((start, end), instances, more) tuples,
+    one for every chunk, where the chunk covers the lines start to
+    end, the instances are sorted as find_all_instances sorts them,
+    and more is True if there are chunks still to come.
+
+    Example:
+    python_filename = 'naughty.py'
+    first = 190
+    last = 200
+
+    >>>next(generate_viewport(python_filename, first, last))
+    ((190, 197), [[SINGLE_CHAR_VAR,194,7,r,
+                   "      r = gradient_row(image, row, col)"], ...], True)
+    '''
+    _source, encoding, lines = read_source(python_filename)
+    if not lines:
+        return
+    first = min(max(first, 1), len(lines))
+    last = min(max(last, first), len(lines))
+
+    scan = get_scan(python_filename, lines)
+    starts = scan["STARTS"]
+    indents = scan["INDENTS"]
+
+    def start_before(line_number):
+        # The last start at or before line_number, or 1.
+        index = bisect_right(starts, line_number)
+        return starts[index - 1] if index else 1
+
+    def start_after(line_number):
+        # The first start after line_number, the end of the file if
+        # there is none, or None if the scan stopped before either.
+        scan_past(scan, line_number)
+        index = bisect_right(starts, line_number)
+        if index < len(starts):
+            return starts[index]
+        if scan["END"] > len(lines):
+            return len(lines) + 1
+        return None
+
+    def token_end():
+        # The line after the last one the tokenizer can find anything
+        # on, if the rest are inside a string that runs to the end of
+        # the file.
+        return scan["END"] + 1 if scan["STRING_TO_END"] else None
+
+    high = start_after(last)
+    low = start_before(first)
+    # The start the lines from high on are tokenized from, if high is
+    # not a start itself.
+    high_token_start = None
+    if high is None:
+        high_token_start = low
+        if low == start_before(len(lines)):
+            low = first
+        high = last + 1
+    instances = lint_chunk(python_filename, lines, encoding, low, high,
+                           indents.get(start_before(low), ()),
+                           start_before(low), token_end())
+    yield (low, high - 1), instances, low > 1 or high <= len(lines)
+
+    while low > 1 or high <= len(lines):
+        if high <= len(lines):
+            token_start = high_token_start
+            end = None
+            if token_start is None:
+                token_start = high
+                end = start_after(min(high + chunk_size - 1, len(lines)))
+            if end is None:
+                end = len(lines) + 1
+            instances = lint_chunk(python_filename, lines, encoding, high,
+                                   end, indents.get(token_start, ()),
+                                   token_start, token_end())
+            chunk_range = (high, end - 1)
+            high = end
+            yield chunk_range, instances, low > 1 or high <= len(lines)
+        if low > 1:
+            start = start_before(low - chunk_size)
+            instances = lint_chunk(python_filename, lines, encoding, start,
+                                   low, indents.get(start, ()), start,
+                                   token_end())
+            chunk_range = (start, low - 1)
+            low = start
+            yield chunk_range, instances, low > 1 or high <= len(lines)
+
+
+def lint_viewport(python_filename, first, last, time_budget,
+                  chunk_size=CHUNK_SIZE):
+    '''
+    Lints the lines first to last of a python file, and then as much
+    of the rest of the file as time_budget allows, with
+    generate_viewport.
+
+    The lines first to last are always linted, however long they
+    take. After that the time is checked before every chunk, so the
+    budget can be overrun by the time of one chunk.
+
+    Parameters:
+
+        python_filename: The python file to lint.
+        first: The line number of the first line on the screen.
+        last: The line number of the last line on the screen.
+        time_budget: The number of seconds to spend on the file.
+        chunk_size: The number of lines to aim for in each chunk.
+
+    Result: A dictionary with the keys:
+
+        "INSTANCES": The instances found on the lines that were linted,
+                     sorted as find_all_instances sorts them.
+        "COMPLETE": A sorted list of (first, last) tuples of the
+                    ranges of lines that were linted, which do not
+                    overlap or touch.
+        "TIMED_OUT": True if the budget ran out before the whole file
+                     was linted.
+
+    Example:
+    python_filename = 'big.py'
+    first = 15000
+    last = 15060
+    time_budget = 0.05
+
+    >>>{'INSTANCES': [['LONG_LINE', 14702, '', 84, ...], ...],
+        'COMPLETE': [(14566, 15510)], 'TIMED_OUT': True}
+    '''
+    deadline = time.monotonic() + time_budget
+    list_total = []
+    ranges = []
+    timed_out = False
+    for (chunk_range, instances, more) in generate_viewport(
+            python_filename, first, last, chunk_size):
+        list_total += instances
+        ranges.append(chunk_range)
+        if more and time.monotonic() > deadline:
+            timed_out = True
+            break
+
+    # Joins the ranges of chunks next to each other.
+    complete = []
+    for (start, end) in sorted(ranges):
+        if complete and complete[-1][1] + 1 >= start:
+            complete[-1] = (complete[-1][0], max(complete[-1][1], end))
+        else:
+            complete.append((start, end))
+
+    list_total.sort(key=lambda tup: (tup[1], FIND_ORDER[tup[0]]))
+    return {"INSTANCES": list_total,
+            "COMPLETE": complete,
+            "TIMED_OUT": timed_out}